@@ -24,58 +24,102 @@ DEPENDENCIES:
 - Numpy
 - Matplotlib
 - PyQt5
-- xlrd
+- xlrd or openpyxl (Excel files)
+Matplotlib and the counting modules are only loaded once they are needed,
+so the window opens without waiting for them.
 -------------------------------------------------------------------------------
 """
 
+import os
+import time
+from sys import argv
 
-def install_module(module: str) -> None:
-    pypath = os.path.dirname(executable)
-    pippath = os.path.join(pypath, 'Scripts', 'pip.exe')
-    os.system(f'"{pippath}" install {module}')
+import numpy as np
+from PyQt5.QtCore import QThread, QTimer, pyqtSignal
+from PyQt5.QtGui import QIcon
+from PyQt5.QtWidgets import (QApplication, QDesktopWidget, QFileDialog,
+                             QGridLayout, QLabel, QLineEdit, QProgressBar,
+                             QPushButton, QTextBrowser, QWidget)
 
+# Cycles drawn on the signal plot, the largest ranges are kept
+PLOT_CYCLES = 2000
 
-import os
-from sys import argv, path, executable
-import time
-from concurrent.futures import ProcessPoolExecutor
-
-try:
-    from PyQt5.QtGui import QIcon
-    from PyQt5.QtWidgets import (QApplication, QDesktopWidget, QFileDialog,
-                                 QGridLayout, QLabel, QLineEdit, QPushButton,
-                                 QTextBrowser, QWidget)
-except ModuleNotFoundError:
-    install_module('pyqt5')
-    from PyQt5.QtGui import QIcon
-    from PyQt5.QtWidgets import (QApplication, QDesktopWidget, QFileDialog,
-                                 QGridLayout, QLabel, QLineEdit, QPushButton,
-                                 QTextBrowser, QWidget)
-
-
-try:
-    from matplotlib import pyplot as plt
-    from matplotlib.backends.backend_qt5agg import \
-        FigureCanvasQTAgg as FigureCanvas
-    from matplotlib.backends.backend_qt5agg import \
-        NavigationToolbar2QT as NavigationalToolbar
-    from matplotlib.figure import Figure
-except ModuleNotFoundError:
-    install_module('matplotlib')
-    from matplotlib import pyplot as plt
-    from matplotlib.backends.backend_qt5agg import \
-        FigureCanvasQTAgg as FigureCanvas
-    from matplotlib.backends.backend_qt5agg import \
-        NavigationToolbar2QT as NavigationalToolbar
-    from matplotlib.figure import Figure
-
-try:
-    from xlrd import open_workbook
-except:
-    install_module('xlrd')
-    from xlrd import open_workbook
-
-from rainflow import rainflow
+
+def decimate(sig, buckets):
+    """
+    Min/max decimation of sig for plotting
+
+    INPUT
+    sig: Array to plot
+    buckets: Number of buckets, about the width of the plot in pixels
+
+    OUTPUT
+    Tuple (x, y) holding the minimum and maximum of every bucket in order,
+    which draws the same envelope as the full signal
+    """
+    sig = np.asarray(sig, dtype=float)
+    if len(sig) <= 2 * buckets:
+        return np.arange(len(sig)), sig
+    size = -(-len(sig) // buckets)
+    blocks = np.pad(sig, (0, size * buckets - len(sig)), mode='edge')
+    blocks = blocks.reshape(buckets, size)
+    start = np.arange(buckets)[:, None] * size
+    x = np.sort(np.column_stack([blocks.argmin(axis=1), blocks.argmax(axis=1)])
+                + start, axis=1).ravel()
+    x = np.minimum(x, len(sig) - 1)
+    return x, sig[x]
+
+
+class Cancelled(Exception):
+    """
+    Raised in the counting thread when the count is cancelled
+    """
+
+
+class CountWorker(QThread):
+    """
+    Reads a file and counts its cycles off the GUI thread
+
+    Progress is passed on from rainflow's progress callback, which is also
+    where a cancelled count is stopped.
+    """
+    progressed = pyqtSignal(object)
+    counted = pyqtSignal(object, object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, file, parent=None):
+        super().__init__(parent)
+        self.file = file
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def _progress(self, progress):
+        if self.cancelled:
+            raise Cancelled()
+        self.progressed.emit(progress)
+
+    def run(self):
+        from rainflow_cache import cached_rainflow
+        from rainflow_loaders import read_channels
+
+        try:
+            # Read every column, empty cells are left out
+            channels = read_channels(self.file)
+            if self.cancelled:
+                return
+            # The plot shows one signal, so the columns are joined end to end
+            data = np.concatenate(channels) if channels else []
+            # Rerunning an unchanged file is a cache hit
+            sig, cycles = cached_rainflow(data, progress=self._progress)
+        except Cancelled:
+            return
+        except Exception as error:
+            self.failed.emit(str(error))
+            return
+        if not self.cancelled:
+            self.counted.emit(sig, cycles)
 
 
 class MainWindow(QWidget):
@@ -88,6 +132,9 @@ class MainWindow(QWidget):
         Initializing class
         """
         super().__init__()
+        self.worker = None
+        self.extrema = 0
+        self.shown = False
         self.init_ui()
 
     def init_ui(self):
@@ -118,109 +165,144 @@ class MainWindow(QWidget):
         self.text_browser = QTextBrowser()
         self.text_browser.setMinimumWidth(300)
         self.text_browser.setMaximumWidth(400)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setMaximumHeight(25)
         base_layout.addWidget(file_label, 0, 0, 1, 1)
         base_layout.addWidget(self.file_text_box, 0, 1, 1, 2)
         base_layout.addWidget(self.browse_button, 0, 3, 1, 1)
+        base_layout.addWidget(self.progress_bar, 2, 0, 1, 3)
         base_layout.addWidget(self.run_btn, 2, 3, 1, 1)
         base_layout.addWidget(self.text_browser, 1, 4, 1, 1)
         base_layout.setColumnStretch(4, 0)
 
+        self.base_layout = base_layout
+        # The plot is created by init_plot once the window is shown
+        self.canvas = None
+
+        qtRectangle = self.frameGeometry()
+        centerPoint = QDesktopWidget().availableGeometry().center()
+        qtRectangle.moveCenter(centerPoint)
+        self.move(qtRectangle.topLeft())
+
+    def init_plot(self):
+        '''
+        Add the plot and its toolbar, Matplotlib is first loaded here
+        '''
+        if self.canvas is not None:
+            return
+        from matplotlib.backends.backend_qt5agg import \
+            FigureCanvasQTAgg as FigureCanvas
+        from matplotlib.backends.backend_qt5agg import \
+            NavigationToolbar2QT as NavigationalToolbar
+        from matplotlib.figure import Figure
+
         self.fig = Figure()
         self.fig.subplots_adjust(
             top=0.955, bottom=0.095, left=0.077, right=0.967)
         self.axes = self.fig.add_subplot(111)
         self.canvas = FigureCanvas(self.fig)
         ntb = NavigationalToolbar(self.canvas, self)
-        base_layout.addWidget(ntb, 0, 4, 1, 1)
-        base_layout.addWidget(self.canvas, 1, 0, 1, 4)
-
-        qtRectangle = self.frameGeometry()
-        centerPoint = QDesktopWidget().availableGeometry().center()
-        qtRectangle.moveCenter(centerPoint)
-        self.move(qtRectangle.topLeft())
+        self.base_layout.addWidget(ntb, 0, 4, 1, 1)
+        self.base_layout.addWidget(self.canvas, 1, 0, 1, 4)
 
     def open(self):
         '''
         Select and open file.
-        Presents the QFileDialog class and allows the opening of only .xlsx files
+        Presents the QFileDialog class and allows the opening of Excel, CSV and .npy files
         '''
         loc = os.getenv("HOMEDRIVE") + os.getenv("HOMEPATH")+"\\Desktop"
         file, ok = QFileDialog.getOpenFileName(
-            self, 'Open', loc, 'Excel Workbook (*.xlsx);;Excel 97-2003 Workbook (*.xls)')
+            self, 'Open', loc, 'Excel Workbook (*.xlsx);;Excel 97-2003 Workbook (*.xls);;'
+            'CSV (*.csv);;NumPy Array (*.npy)')
         if ok:
             self.file_text_box.setText(file)
             self.run_btn.setEnabled(True)
 
     def run(self):
         '''
-        Evalate results
+        Start counting the file in the background, or cancel a running count
+        '''
+        if self.worker is not None:
+            self.worker.cancel()
+            self.run_btn.setEnabled(False)
+            return
+
+        self.ts = time.time()
+        self.extrema = 0
+        self.shown = False
+        self.progress_bar.setRange(0, 0)
+        self.progress_bar.setFormat('Reading')
+        self.browse_button.setEnabled(False)
+        self.run_btn.setText('Cancel')
+        self.worker = CountWorker(self.file_text_box.text(), self)
+        self.worker.progressed.connect(self.show_progress)
+        self.worker.counted.connect(self.show_results)
+        self.worker.failed.connect(self.text_browser.setText)
+        self.worker.finished.connect(self.count_finished)
+        self.worker.start()
+
+    def show_progress(self, progress):
+        '''
+        Show a rainflow Progress on the progress bar
         '''
+        if progress.phase == 'sig2ext':
+            # The number of extrema to count is known from here on
+            self.extrema = progress.extrema
+            self.progress_bar.setRange(0, max(self.extrema, 1))
+        if self.extrema:
+            self.progress_bar.setValue(min(progress.extrema, self.extrema))
+        self.progress_bar.setFormat(progress.phase + ' %p%')
 
-        def plot_extrema(self, extremas):
-            """
-            Plot rainflow on canvas
-
-            INPUT:
-            this: A MainWindow class object
-            extremes: A list of tuple containing only peak or valleys
-            """
-            for extrema in extremas:
-                # Plot each extrema's data on the axes using the class' plotting mechanism
-                extrema.plot(self.axes)
-                text = str(extrema.value) + '\t' + str(extrema.position[-1]) + \
-                    '\t' + str(extrema.range) + '\t' + '0.5'
-                self.text_browser.append(text)
-
-        # Convert excel data into list
-        ts = time.time()
-        file = self.file_text_box.text()
-        book = open_workbook(file)  # Opening the Excel
-        sheet = book.sheet_by_index(0)  # Select the first sheet
-        row_len = sheet.row_len(0)  # Getting number of columns to loop through
-        data = []
-        for row in range(row_len):
-            data += sheet.col_values(row)
-
-        # Rejecting empty cells
-        while '' in data:
-            data.remove('')
-
-        # Run rainflow sequence
-        sig, peaks, valleys = rainflow(data)  # Run rainflow sequence
+    def count_finished(self):
+        '''
+        Make the window ready for the next count
+        '''
+        # A count can finish just before it is cancelled
+        cancelled = self.worker.cancelled and not self.shown
+        self.worker = None
+        self.progress_bar.setRange(0, 1)
+        self.progress_bar.setValue(0 if cancelled else 1)
+        self.progress_bar.setFormat('Cancelled' if cancelled else '%p%')
+        self.browse_button.setEnabled(True)
+        self.run_btn.setText('Run')
+        self.run_btn.setEnabled(True)
+
+    def show_results(self, sig, cycles):
+        '''
+        Plot the counted cycles and list them
+        '''
+        self.shown = True
+        self.init_plot()
         self.axes.cla()  # Clear the plot axis
-        # Plot the series data on the axis
-        self.axes.plot(sig, 'k', linewidth='3')
-        header = 'FROM\tTO\tRANGE\tCYCLES'
-        self.text_browser.setText(header)
+        # Plot the series data on the axis, at most two points per pixel
+        x, y = decimate(sig, max(self.canvas.width(), 1))
+        self.axes.plot(x, y, 'k', linewidth='3')
+        # Plot the cycle paths as one collection
+        cycles.plot(self.axes, limit=PLOT_CYCLES)
 
-        # Run independent code of separate threads
-        plot_extrema(self, peaks)
-        plot_extrema(self, valleys)
+        rows = zip(cycles['from'].tolist(), cycles['to'].tolist(),
+                   np.round(cycles['range'], 1).tolist(),
+                   cycles['count'].tolist())
+        text = ['FROM\tTO\tRANGE\tCYCLES']
+        text += ['{}\t{}\t{}\t{}'.format(*row) for row in rows]
+        self.text_browser.setPlainText('\n'.join(text))
 
         self.canvas.draw()
-        print('Took {}s'.format(time.time() - ts))
-        self.plot_range_cycle(peaks, valleys)
+        print('Took {}s'.format(time.time() - self.ts))
+        self.plot_range_cycle(cycles)
 
-    def plot_range_cycle(self, peaks, valleys):
+    def plot_range_cycle(self, cycles):
         """
         Plot Number of Cycles against Temperature Range
         """
-        cycles: dict = {}
-        for peak in peaks:
-            if peak.range in cycles.keys():
-                cycles[peak.range] += 1
-            else:
-                cycles[peak.range] = 1
-        for valley in valleys:
-            if valley.range in cycles.keys():
-                cycles[valley.range] += 1
-            else:
-                cycles[valley.range] = 1
-        temp_range = list(cycles.keys())
-        temp_range.sort()
-        number_of_cycles = []
-        for key in temp_range:
-            number_of_cycles.append(cycles[key])
+        from matplotlib import pyplot as plt
+        from rainflow import Histogram
+
+        histogram = Histogram(0.1).add_cycles(cycles)
+        counted = histogram.range_counts > 0
+        temp_range = histogram.ranges[counted]
+        # Full cycles count as two half cycles
+        number_of_cycles = 2 * histogram.range_counts[counted]
         plt.semilogy(temp_range, number_of_cycles)
         plt.xlabel('Temperature Range')
         plt.ylabel('Number of Half Cycles')
@@ -231,5 +313,7 @@ if __name__ == '__main__':
     APP = QApplication(argv)
     MYINSTANCE = MainWindow()
     MYINSTANCE.show()
+    # Load Matplotlib once the window is on screen
+    QTimer.singleShot(0, MYINSTANCE.init_plot)
     APP.aboutToQuit.connect(APP.deleteLater)
     APP.exec_()
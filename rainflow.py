@@ -18,10 +18,36 @@ Email: djangbahevans@gmail.com
 USAGE:
 To call the function in a script on array of turning points <array_ext>:
     import rainflow as rf
-    array_out = rf.rainflow(array_ext)
+    ext, cycles = rf.rainflow(array_ext)
+To count with the original Peak and Valley objects as a reference:
+    ext, cycles = rf.rainflow(array_ext, engine='reference')
+To count a signal that arrives in chunks:
+    counter = rf.RainflowCounter()
+    counter.push(chunk)
+    histogram = counter.finalize()
+To count a signal too long for memory, e.g. a memory mapped .npy file:
+    histogram = rf.count_stream(np.load('long.npy', mmap_mode='r'))
+To only bin the cycles into range, range-mean and from-to matrices:
+    ext, histogram = rf.rainflow(array_ext, histogram=rf.Histogram(0.1))
+Diagnostics are logged to the 'rainflow' logger at DEBUG level, and the
+phases of a count can be followed with a callback:
+    ext, cycles = rf.rainflow(array_ext, progress=print)
+To drop reversals smaller than a hysteresis gate and round to 0.5 steps:
+    ext, cycles = rf.rainflow(array_ext, resolution=0.5, gate=2.0)
+Counting runs on Numba compiled kernels when Numba is installed, to
+choose explicitly:
+    ext, cycles = rf.rainflow(array_ext, backend='python')
+To count every column of a 2-D array on one long lived worker pool:
+    tables = rf.rainflow_batch(array_2d, axis=0, workers=8)
+To count per window of 3600 samples and combine any run of windows:
+    windows = rf.count_windows(array_ext, size=3600)
+    histogram = rf.merge_windows(windows[2:5]).snapshot()
+To count many files from a terminal without the GUI:
+    python -m rainflow 'logs/*.xlsx' -o results
 -------------------------------------------------------------------------------
 DEPENDENCIES:
 - Numpy
+- Numba (optional, for the compiled kernels)
 -------------------------------------------------------------------------------
 NOTES:
 Some portions of Python code modified from rainflow.c code with mex function for Matlab from
@@ -29,12 +55,46 @@ WISDEM project: https://github.com/WISDEM/AeroelasticSE/tree/master/src/Aeroelas
 -------------------------------------------------------------------------------
 """
 
+import logging
+import time
+from collections import namedtuple
+from itertools import islice
 from random import choice
-from concurrent.futures import ProcessPoolExecutor
-# from typing import 
 
 import numpy as np
 
+logger = logging.getLogger(__name__)
+
+# Reported to progress callbacks at the end of each phase (preprocess,
+# sig2ext, count, aggregate) and every FLUSH_SIZE extrema while counting,
+# together with the backend ('python' or 'numba') the kernels run on
+Progress = namedtuple('Progress', ['phase', 'extrema', 'residue', 'elapsed',
+                                   'backend'], defaults=(None,))
+
+
+class _Monitor(object):
+    """
+    Times the phases of a count, logging them and passing them to progress
+    """
+
+    def __init__(self, progress=None, backend=None):
+        self.progress = progress
+        self.backend = backend
+        self.phase = None
+        self.start = time.perf_counter()
+
+    def begin(self, phase) -> None:
+        self.phase = phase
+        self.start = time.perf_counter()
+
+    def report(self, extrema=0, residue=0) -> None:
+        elapsed = time.perf_counter() - self.start
+        logger.debug('%s: %d extrema, residue %d, %.6fs (%s)', self.phase,
+                     extrema, residue, elapsed, self.backend)
+        if self.progress is not None:
+            self.progress(Progress(self.phase, extrema, residue, elapsed,
+                                   self.backend))
+
 
 class Valley(object):
     def __init__(self, value, index, sig):
@@ -59,7 +119,6 @@ class Valley(object):
         return self.__parent_signal__
 
     def plot(self, axes) -> None:
-        print('Plotting Valley at index {}'.format(self.index))
         x = []
         y = []
         shapes = ['s', '^', '*', 'o', '.', 'v', '<', '>', '1', '2', '3', '4',
@@ -106,7 +165,6 @@ class Peak(object):
         return self.__parent_signal__
 
     def plot(self, axes) -> None:
-        print('Plotting Peak at index {}'.format(self.index))
         x = []
         y = []
         shapes = ['s', '^', '*', 'o', '.', 'v', '<', '>', '1', '2', '3', '4',
@@ -130,6 +188,315 @@ class Peak(object):
         axes.plot(x[0], y[0], color + shape)
 
 
+CYCLE_DTYPE = np.dtype([('from', float), ('to', float), ('range', float),
+                        ('mean', float), ('count', float), ('start', np.int64),
+                        ('end', np.int64)])
+
+
+class CycleTable(object):
+    """
+    Counted cycles stored column wise in a structured array of CYCLE_DTYPE
+
+    Columns are available as views, e.g. table['from'] or table.range, and
+    to_numpy() hands out the underlying array without copying. The signal
+    the start and end indices refer to is only kept by reference, the path
+    of each cycle is rebuilt from it when the table is plotted.
+    """
+    __slots__ = ('data', 'signal')
+
+    def __init__(self, data, signal=None):
+        self.data = data
+        self.signal = signal
+
+    @classmethod
+    def from_records(cls, cycles, signal=None):
+        """
+        Build a table from (from, to, count, start, end) records
+
+        INPUT
+        cycles: List of records or an (n, 5) array of records
+        signal: Signal the start and end indices refer to
+
+        OUTPUT
+        CycleTable ordered by start index
+        """
+        records = _as_records(cycles)
+        # Every extrema starts at most one cycle, so this order is unique
+        records = records[np.argsort(records[:, 3], kind='stable')]
+        data = np.empty(len(records), dtype=CYCLE_DTYPE)
+        data['from'] = records[:, 0]
+        data['to'] = records[:, 1]
+        data['range'] = np.abs(records[:, 1] - records[:, 0])
+        data['mean'] = (records[:, 0] + records[:, 1]) / 2
+        data['count'] = records[:, 2]
+        data['start'] = records[:, 3]
+        data['end'] = records[:, 4]
+        return cls(data, signal)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.data[key]
+        return CycleTable(np.atleast_1d(self.data[key]), self.signal)
+
+    def __iter__(self):
+        return iter(self.data)
+
+    @property
+    def range(self):
+        return self.data['range']
+
+    @property
+    def mean(self):
+        return self.data['mean']
+
+    @property
+    def count(self):
+        return self.data['count']
+
+    def to_numpy(self):
+        """
+        The structured array behind the table, not a copy
+        """
+        return self.data
+
+    def trajectory(self, i):
+        """
+        Path of the water flowing from the start to the end of cycle i
+
+        OUTPUT
+        Tuple (x, y) of arrays
+        """
+        cycle = self.data[i]
+        start = int(cycle['start'])
+        end = int(cycle['end'])
+        y = np.asarray(self.signal[start:end + 1], dtype=float)
+        if cycle['to'] < cycle['from']:
+            y = np.maximum(np.minimum.accumulate(y), cycle['to'])
+        else:
+            y = np.minimum(np.maximum.accumulate(y), cycle['to'])
+        return np.arange(start, start + len(y)), y
+
+    def plot(self, axes, limit=None) -> None:
+        """
+        Plot the path of every cycle on axes as a single collection
+
+        With a limit only that many cycles of the largest range are drawn.
+        """
+        # Matplotlib is only needed when plotting
+        from matplotlib.collections import LineCollection
+
+        colors = ['y', 'm', 'c', 'r', 'g', 'b', 'k']
+        order = np.arange(len(self.data))
+        if limit is not None and limit < len(order):
+            order = np.sort(np.argsort(self.data['range'],
+                                       kind='stable')[len(order) - limit:])
+        if not len(order):
+            return
+        paths = [np.column_stack(self.trajectory(i)) for i in order]
+        color = [choice(colors) for _ in paths]
+        axes.add_collection(LineCollection(paths, colors=color))
+        # Mark where each cycle starts and ends
+        ends = np.array([(path[0], path[-1]) for path in paths])
+        axes.scatter(ends[:, :, 0].ravel(), ends[:, :, 1].ravel(), s=12,
+                     c=np.repeat(color, 2), zorder=3)
+        axes.autoscale_view()
+
+
+class Histogram(object):
+    """
+    Binned rainflow matrices that can be filled while counting
+
+    Levels are binned to the nearest multiple of width. Ranges are counted
+    in whole widths between the from and to bins, and means in half widths
+    since the mean of two levels falls on half steps, so cycles never change
+    bin with float rounding. Only the from-to bin pairs that were counted
+    are stored, with full cycles split into a half cycle in each direction,
+    and the matrices are built from them when asked for. Histograms with
+    the same width are merged by adding them.
+
+    range_counts: Cycles per range bin, range_counts[k] is a range of
+        ranges[k]
+    range_mean: Cycles per range (rows) and mean (columns, see means) bin
+    from_to: Cycles per from (rows) and to (columns) bin of levels
+    """
+    __slots__ = ('width', 'froms', 'tos', 'counts')
+
+    def __init__(self, width=0.1):
+        self.width = width
+        # Sorted unique from and to level bins and their number of cycles
+        self.froms = np.zeros(0, dtype=np.int64)
+        self.tos = np.zeros(0, dtype=np.int64)
+        self.counts = np.zeros(0)
+
+    @property
+    def offset(self):
+        """
+        Level bin of the first row and column of from_to
+        """
+        return int(min(self.froms.min(), self.tos.min())) if len(self.counts) \
+            else 0
+
+    @property
+    def levels(self):
+        size = int(max(self.froms.max(), self.tos.max())) - self.offset + 1 \
+            if len(self.counts) else 0
+        return (self.offset + np.arange(size)) * self.width
+
+    @property
+    def ranges(self):
+        return np.arange(len(self.range_counts)) * self.width
+
+    @property
+    def means(self):
+        sums = self.froms + self.tos
+        if not len(sums):
+            return np.zeros(0)
+        return np.arange(sums.min(), sums.max() + 1) * self.width / 2
+
+    @property
+    def total(self):
+        return self.counts.sum()
+
+    @property
+    def range_counts(self):
+        return np.bincount(np.abs(self.tos - self.froms), weights=self.counts)
+
+    @property
+    def range_mean(self):
+        ranges = np.abs(self.tos - self.froms)
+        sums = self.froms + self.tos
+        if not len(sums):
+            return np.zeros((0, 0))
+        matrix = np.zeros((ranges.max() + 1, sums.max() - sums.min() + 1))
+        np.add.at(matrix, (ranges, sums - sums.min()), self.counts)
+        return matrix
+
+    @property
+    def from_to(self):
+        size = len(self.levels)
+        matrix = np.zeros((size, size))
+        np.add.at(matrix, (self.froms - self.offset, self.tos - self.offset),
+                  self.counts)
+        return matrix
+
+    def copy(self):
+        other = Histogram(self.width)
+        other.froms = self.froms.copy()
+        other.tos = self.tos.copy()
+        other.counts = self.counts.copy()
+        return other
+
+    def _merge(self, froms, tos, counts):
+        """
+        Add counts to the from and to bin pairs
+        """
+        froms = np.concatenate([self.froms, froms])
+        tos = np.concatenate([self.tos, tos])
+        counts = np.concatenate([self.counts, counts])
+        if not len(counts):
+            return
+        low_from, low_to = int(froms.min()), int(tos.min())
+        span = int(tos.max()) - low_to + 1
+        if (int(froms.max()) - low_from + 1) * span < 1 << 62:
+            # Pack each pair into one integer relative to the lowest bins
+            keys, inverse = np.unique((froms - low_from) * span +
+                                      (tos - low_to), return_inverse=True)
+            self.froms = keys // span + low_from
+            self.tos = keys % span + low_to
+            self.counts = np.bincount(inverse.ravel(), weights=counts,
+                                      minlength=len(keys))
+            return
+        # Bins too far apart to pack are reduced on the sorted pairs
+        order = np.lexsort((tos, froms))
+        froms, tos, counts = froms[order], tos[order], counts[order]
+        first = np.ones(len(froms), dtype=bool)
+        first[1:] = (froms[1:] != froms[:-1]) | (tos[1:] != tos[:-1])
+        starts = np.flatnonzero(first)
+        self.froms = froms[starts]
+        self.tos = tos[starts]
+        self.counts = np.add.reduceat(counts, starts)
+
+    def add(self, froms, tos, counts=1.0):
+        """
+        Add cycles going from froms to tos
+
+        INPUT
+        froms, tos: Arrays of the start and end level of each cycle
+        counts: Number of cycles, 1.0 for full and 0.5 for half cycles
+
+        OUTPUT
+        The histogram itself
+        """
+        froms = np.rint(np.asarray(froms, dtype=float) / self.width)
+        tos = np.rint(np.asarray(tos, dtype=float) / self.width)
+        if not len(froms):
+            return self
+        froms = froms.astype(np.int64)
+        tos = tos.astype(np.int64)
+        counts = np.broadcast_to(np.asarray(counts, dtype=float), froms.shape)
+
+        # A full cycle is a half cycle each way, which also keeps from_to
+        # independent of which end of the cycle the count closed on
+        full = counts >= 1.0
+        halves = np.where(full, counts / 2, counts)
+        self._merge(np.concatenate([froms, tos[full]]),
+                    np.concatenate([tos, froms[full]]),
+                    np.concatenate([halves, halves[full]]))
+        return self
+
+    def add_cycles(self, cycles):
+        """
+        Add the cycles of a CycleTable
+
+        OUTPUT
+        The histogram itself
+        """
+        return self.add(cycles['from'], cycles['to'], cycles['count'])
+
+    @classmethod
+    def merge(cls, histograms):
+        """
+        Sum of many histograms of the same width in a single pass
+
+        OUTPUT
+        A new Histogram
+        """
+        histograms = list(histograms)
+        if not histograms:
+            raise ValueError('No histograms to merge')
+        width = histograms[0].width
+        for other in histograms:
+            if other.width != width:
+                raise ValueError('Can not merge histograms of width {} and {}'
+                                 .format(width, other.width))
+        merged = cls(width)
+        merged._merge(np.concatenate([h.froms for h in histograms]),
+                      np.concatenate([h.tos for h in histograms]),
+                      np.concatenate([h.counts for h in histograms]))
+        return merged
+
+    def __iadd__(self, other):
+        if other.width != self.width:
+            raise ValueError('Can not merge histograms of width {} and {}'.format(
+                self.width, other.width))
+        self._merge(other.froms, other.tos, other.counts)
+        return self
+
+    def __add__(self, other):
+        histogram = self.copy()
+        histogram += other
+        return histogram
+
+    def __eq__(self, other):
+        return isinstance(other, Histogram) and self.width == other.width and \
+            np.array_equal(self.froms, other.froms) and \
+            np.array_equal(self.tos, other.tos) and \
+            np.array_equal(self.counts, other.counts)
+
+
 def isvalley(index, signal) -> bool:
     try:
         if signal[index+1] > signal[index]:
@@ -140,7 +507,7 @@ def isvalley(index, signal) -> bool:
     return False
 
 
-def eval_peaks(peaks_extremes, sig) -> None:
+def eval_peaks(peaks_extremes, sig) -> list:
     """
     Rainflow codes for the evaluation of valleys
 
@@ -149,11 +516,10 @@ def eval_peaks(peaks_extremes, sig) -> None:
     sig: Original list or tuple from which valleys_extreme was created
 
     OUTPUT
-    None
+    List peaks_extremes: The evaluated Peak objects
     """
-    print('Inside peak function')
+    logger.debug('Evaluating %d peaks', len(peaks_extremes))
     for a, peak in enumerate(peaks_extremes):
-        print('Peak at index {}'.format(peak.index))
         con_sigs = sig[peak.index+1:]
         for con_sig, _ in enumerate(con_sigs):
             if not peak.terminate:
@@ -187,10 +553,10 @@ def eval_peaks(peaks_extremes, sig) -> None:
                                 c_peak_pos > peak.position[-1] else peak.position[-1]
             else:
                 break
-    print('Exiting Peak Function')
+    return peaks_extremes
 
 
-def eval_valleys(valleys_extreme, sig) -> None:
+def eval_valleys(valleys_extreme, sig) -> list:
     """
     Rainflow codes for the evaluation of valleys
 
@@ -199,13 +565,12 @@ def eval_valleys(valleys_extreme, sig) -> None:
     sig: Original list or tuple from which valleys_extreme was created
 
     OUTPUT
-    None
+    List valleys_extreme: The evaluated Valley objects
     """
-    print('Inside Valleys function')
+    logger.debug('Evaluating %d valleys', len(valleys_extreme))
 
     # Loop through all valley objects
     for a, valley in enumerate(valleys_extreme):
-        print('Valley at index {}'.format(valley.index))
         # Considers signals that come after selected valley
         con_sigs = sig[valley.index+1:]
         # Loops through the selected signal
@@ -247,30 +612,664 @@ def eval_valleys(valleys_extreme, sig) -> None:
                                 <= valley.position[-1] else valley.position[-1]
             else: # If the valley has terminated, skip the entire loop
                 break
-    print('Exiting Valley function')
+    return valleys_extreme
+
+
+# 'auto' uses the Numba compiled kernels of rainflow_jit when Numba is
+# installed, 'python' the NumPy and pure Python ones
+BACKENDS = ('auto', 'python', 'numba')
+
+
+def _kernels(backend):
+    """
+    Resolve a backend to its name and kernel module
+
+    rainflow_jit is only imported here, so Numba is never loaded unless a
+    count asks for it.
+
+    OUTPUT
+    Tuple (name, module), module is None for the 'python' backend
+    """
+    if backend not in BACKENDS:
+        raise ValueError('Unknown backend {!r}, expected one of {}'.format(
+            backend, ', '.join(BACKENDS)))
+    if backend == 'python':
+        return 'python', None
+    try:
+        import rainflow_jit
+    except ImportError:
+        if backend == 'numba':
+            raise
+        return 'python', None
+    return 'numba', rainflow_jit
+
+
+def _count_stack(values, indices, stack_v, stack_i, cycles):
+    """
+    Push extrema onto the residue stack closing full cycles as they appear
+
+    INPUT
+    values, indices: Sequences of extrema values and their indices
+    stack_v, stack_i: Open residue values and indices, updated in place
+    cycles: List the closed (from, to, count, start, end) records are
+        appended to
+
+    OUTPUT
+    None
+    """
+    for value, index in zip(values, indices):
+        stack_v.append(value)
+        stack_i.append(index)
+        while len(stack_v) >= 4:
+            b = stack_v[-3]
+            c = stack_v[-2]
+            x = abs(c - b)
+            if x <= abs(b - stack_v[-4]) and x <= abs(stack_v[-1] - c):
+                cycles.append((b, c, 1.0, stack_i[-3], stack_i[-2]))
+                del stack_v[-3:-1]
+                del stack_i[-3:-1]
+            else:
+                break
+
+
+def _count_residue(stack_v, stack_i, cycles):
+    """
+    Count what is left on the residue stack as half cycles
+    """
+    for k in range(len(stack_v) - 1):
+        cycles.append((stack_v[k], stack_v[k + 1], 0.5,
+                       stack_i[k], stack_i[k + 1]))
+
+
+def _as_records(cycles):
+    """
+    (n, 5) array of a list of (from, to, count, start, end) records
+
+    The compiled kernels append their records as whole (m, 5) arrays, any
+    tuples after them come from counting the residue.
+    """
+    if isinstance(cycles, np.ndarray):
+        return cycles.reshape(-1, 5)
+    if cycles and isinstance(cycles[0], np.ndarray):
+        arrays = [block for block in cycles if isinstance(block, np.ndarray)]
+        rows = [row for row in cycles if not isinstance(row, np.ndarray)]
+        return np.concatenate(
+            arrays + [np.array(rows, dtype=float).reshape(-1, 5)])
+    return np.array(cycles, dtype=float).reshape(-1, 5)
+
+
+def _add_records(histogram, cycles):
+    """
+    Add a list of (from, to, count, start, end) records to histogram
+    """
+    records = _as_records(cycles)
+    histogram.add(records[:, 0], records[:, 1], records[:, 2])
+
+
+# Extrema pushed through the stack between two flushes into a histogram
+# and between two progress reports
+FLUSH_SIZE = 65536
+
+
+def _count_blocks(values, indices, stack_v, stack_i, cycles, histogram=None,
+                  monitor=None, backend='python'):
+    """
+    Push extrema through the stack in blocks of FLUSH_SIZE
+
+    With a histogram the closed cycles are added to it after every block,
+    so they are never all held at once.
+    """
+    kernels = _kernels(backend)[1]
+    for start in range(0, len(values), FLUSH_SIZE):
+        block = slice(start, start + FLUSH_SIZE)
+        if kernels is None:
+            _count_stack(values[block].tolist(), indices[block].tolist(),
+                         stack_v, stack_i, cycles)
+        else:
+            kernels.count_stack(values[block], indices[block],
+                                stack_v, stack_i, cycles)
+        if histogram is not None:
+            _add_records(histogram, cycles)
+            del cycles[:]
+        if monitor is not None:
+            monitor.report(min(start + FLUSH_SIZE, len(values)), len(stack_v))
+
+
+def _count_chunk(values, indices, width=None, backend='python'):
+    """
+    Count a chunk of extrema in a worker process
+
+    OUTPUT
+    Tuple (cycles, residue_values, residue_indices) of compact arrays holding
+    the closed cycles and the open residue of the chunk. With a histogram
+    width the closed cycles are returned as a Histogram instead
+    """
+    cycles = []
+    stack_v = []
+    stack_i = []
+    histogram = None if width is None else Histogram(width)
+    _count_blocks(values, indices, stack_v, stack_i, cycles, histogram,
+                  backend=backend)
+    if histogram is None:
+        histogram = _as_records(cycles)
+    return (histogram, np.array(stack_v, dtype=float),
+            np.array(stack_i, dtype=float))
+
+
+# Below this many extrema per worker the process pool costs more than it saves
+MIN_CHUNK = 50000
+
+# Worker pool shared by every call, so processes are only started once
+__pool__ = None
+__pool_workers__ = 0
+
+
+def _get_pool(workers):
+    """
+    The shared process pool, started or grown to at least workers processes
+    """
+    global __pool__, __pool_workers__
+    if __pool__ is None or __pool_workers__ < workers:
+        # Multiprocessing is only imported once a count runs in parallel
+        from concurrent.futures import ProcessPoolExecutor
+        if __pool__ is not None:
+            __pool__.shutdown()
+        __pool__ = ProcessPoolExecutor(max_workers=workers)
+        __pool_workers__ = workers
+    return __pool__
+
+
+def close_pool() -> None:
+    """
+    Shut the shared worker pool down, it is restarted when next needed
+    """
+    global __pool__, __pool_workers__
+    if __pool__ is not None:
+        __pool__.shutdown()
+    __pool__ = None
+    __pool_workers__ = 0
+
+
+def count_cycles(ext, indices=None, workers=1, histogram=None, progress=None,
+                 backend='auto'):
+    """
+    Rainflow codes for the stack based (ASTM E1049 four-point) counting engine
+
+    Makes a single pass over the extrema keeping only the open residue on a
+    stack. Whenever the inner range of the top four points is not larger than
+    either outer range a full cycle is closed and its two inner points are
+    removed. Whatever is left on the stack at the end is counted as half
+    cycles.
+
+    With more than one worker the extrema are split into one chunk per
+    worker and each chunk is counted in its own process. Only the closed
+    cycles and the open residue of each chunk are sent back, and the
+    residues are then pushed through the stack in signal order, which gives
+    exactly the cycles of a single process count. Only where extrema of
+    equal value tie may a full cycle be closed on a different one of them.
+
+    INPUT
+    ext: List, tuple or array of alternating extrema, e.g. from sig2ext
+    indices: Optional index of each extrema, defaults to its position in ext
+    workers: Number of processes to count with
+    histogram: Optional Histogram to add the cycles to as they are counted
+        instead of building a CycleTable
+    progress: Optional callable given a Progress after each block of
+        extrema is counted and once the result is aggregated
+    backend: 'python', 'numba' for the compiled kernels, or 'auto' to use
+        them when Numba is installed
+
+    OUTPUT
+    CycleTable ordered by start index, referring to ext. Full cycles have a
+    count of 1.0 and residual half cycles a count of 0.5. If a histogram was
+    given it is returned instead
+    """
+    values = np.asarray(ext, dtype=float)
+    if indices is None:
+        indices = np.arange(len(values))
+    else:
+        indices = np.asarray(indices)
+
+    backend = _kernels(backend)[0]
+    monitor = _Monitor(progress, backend)
+    monitor.begin('count')
+    cycles = []
+    stack_v = []
+    stack_i = []
+    workers = min(workers, len(values) // MIN_CHUNK)
+    width = None if histogram is None else histogram.width
+    if workers > 1:
+        chunks = list(zip(np.array_split(values, workers),
+                          np.array_split(indices, workers)))
+        closed = []
+        counted = 0
+        pool = _get_pool(workers)
+        futures = [pool.submit(_count_chunk, v, i, width, backend)
+                   for v, i in chunks]
+        for future, (chunk, _) in zip(futures, chunks):
+            chunk_cycles, residue_v, residue_i = future.result()
+            closed.append(chunk_cycles)
+            _count_stack(residue_v.tolist(), residue_i.tolist(),
+                         stack_v, stack_i, cycles)
+            counted += len(chunk)
+            monitor.report(counted, len(stack_v))
+
+        monitor.begin('aggregate')
+        residue = len(stack_v)
+        _count_residue(stack_v, stack_i, cycles)
+        if histogram is not None:
+            for chunk_histogram in closed:
+                histogram += chunk_histogram
+            _add_records(histogram, cycles)
+            monitor.report(len(values), residue)
+            return histogram
+        closed.append(_as_records(cycles))
+        table = CycleTable.from_records(np.concatenate(closed), ext)
+        monitor.report(len(values), residue)
+        return table
+
+    _count_blocks(values, indices, stack_v, stack_i, cycles, histogram,
+                  monitor, backend)
+    monitor.begin('aggregate')
+    residue = len(stack_v)
+    _count_residue(stack_v, stack_i, cycles)
+    if histogram is not None:
+        _add_records(histogram, cycles)
+        monitor.report(len(values), residue)
+        return histogram
+    table = CycleTable.from_records(cycles, ext)
+    monitor.report(len(values), residue)
+    return table
+
+
+def _as_numbers(sig):
+    """
+    Float array of sig, NaN for values that can not be converted to float
+    """
+    try:
+        return np.asarray(sig, dtype=float)
+    except ValueError:
+        new_sig = []
+        for signal in sig:
+            try:
+                new_sig += [float(signal)]
+            except ValueError:
+                new_sig += [np.nan]
+        return np.array(new_sig, dtype=float)
+
+
+def _as_float(sig):
+    """
+    Float array of sig, values that can not be converted to float or are NaN
+    are left out of a 1-D sig
+    """
+    values = _as_numbers(sig)
+    if values.ndim == 1:
+        values = values[~np.isnan(values)]
+    return values
+
+
+def _round(sig, decimals):
+    """
+    Vectorized round(float(value), decimals) of every value in sig
+
+    Values that can not be converted to float are left out. Values that lie
+    within rounding error of a tie are rounded by Python's round so the
+    result is identical to rounding each value on its own.
+    """
+    values = _as_float(sig)
+    scale = 10.0 ** decimals
+    scaled = values * scale
+    rounded = np.round(scaled) / scale
+    ties = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5) < 1e-6
+    if ties.any():
+        rounded[ties] = [round(value, decimals)
+                         for value in values[ties].tolist()]
+    return rounded
+
+
+def _quantize(sig, resolution):
+    """
+    Round every value in sig to a multiple of resolution
+
+    A resolution that is a power of ten rounds like round(float(value), n)
+    would, None only converts the values to float. Values that can not be
+    converted to float are left out.
+    """
+    if resolution is None:
+        return _as_float(sig)
+    if resolution <= 0:
+        raise ValueError('resolution must be positive, got {}'.format(
+            resolution))
+    decimals = -np.log10(resolution)
+    if abs(decimals - round(decimals)) < 1e-9:
+        return _round(sig, int(round(decimals)))
+    return np.round(_as_float(sig) / resolution) * resolution
+
+
+class ExtremaStream(object):
+    """
+    Turning points of a signal that arrives in blocks
+
+    Each block is joined to the last two turning points of the blocks before
+    it and its extrema are found with sig2ext. Everything but the last of
+    them is confirmed, the last may still move, e.g. further up a rise, so
+    only those two points are carried to the next block.
+    """
+
+    def __init__(self, resolution=None, backend='auto'):
+        self.resolution = resolution
+        self.backend = _kernels(backend)[0]
+        self.samples = 0
+        # Last turning points, the final one may still move with new samples
+        self.__tail_v__ = np.empty(0)
+        self.__tail_i__ = np.empty(0, dtype=np.int64)
+        self.__tail_pushed__ = False
+
+    @property
+    def pending(self):
+        """
+        Tuple (values, indices) of the turning points not yet confirmed
+        """
+        start = 1 if self.__tail_pushed__ else 0
+        return self.__tail_v__[start:], self.__tail_i__[start:]
+
+    def push(self, samples):
+        """
+        Add a block of samples, rounded to resolution when one is given
+
+        OUTPUT
+        Tuple (values, indices) of the turning points the block confirmed,
+        indices count from the first sample of the stream, skipped values
+        that are not numbers included
+        """
+        values = _as_numbers(samples)
+        indices = np.arange(self.samples, self.samples + len(values))
+        self.samples += len(values)
+        numbers = ~np.isnan(values)
+        values = _quantize(values[numbers], self.resolution)
+        indices = indices[numbers]
+        if not len(values):
+            return self.__tail_v__[:0], self.__tail_i__[:0]
+
+        values = np.concatenate([self.__tail_v__, values])
+        indices = np.concatenate([self.__tail_i__, indices])
+        ext, ext_i = sig2ext(values, return_index=True, backend=self.backend)
+        ext_i = indices[ext_i]
+
+        start = 1 if self.__tail_pushed__ else 0
+        self.__tail_v__ = ext[-2:]
+        self.__tail_i__ = ext_i[-2:]
+        self.__tail_pushed__ = len(ext) > 1
+        return ext[start:-1], ext_i[start:-1]
+
+    def finish(self):
+        """
+        End the signal, its last turning point is confirmed
+
+        OUTPUT
+        Tuple (values, indices) of the remaining turning points
+        """
+        values, indices = self.pending
+        self.__tail_v__ = self.__tail_v__[:0]
+        self.__tail_i__ = self.__tail_i__[:0]
+        self.__tail_pushed__ = False
+        return values, indices
+
+
+# Samples read per block by iter_extrema
+BLOCK_SIZE = 1 << 20
+
+
+def _blocks(source, block_size):
+    """
+    Arrays of block_size samples from an array, memory map or iterable
+    """
+    if isinstance(source, np.ndarray):
+        for start in range(0, len(source), block_size):
+            yield source[start:start + block_size]
+        return
+    samples = iter(source)
+    while True:
+        block = np.fromiter(islice(samples, block_size), dtype=float)
+        if not len(block):
+            return
+        yield block
+
+
+def iter_extrema(source, block_size=BLOCK_SIZE, resolution=None,
+                 backend='auto'):
+    """
+    Turning points of a signal read block by block
+
+    Only one block and two carried turning points are in memory at a time,
+    so memory does not depend on the length of the signal. The turning
+    points are those of sig2ext on the whole signal.
+
+    INPUTS
+    source: Array, memory mapped array or iterable of samples
+    block_size: Samples per block
+    resolution: Optional step the samples are rounded to, see rainflow
+    backend: 'python', 'numba' or 'auto', see rainflow
+
+    OUTPUTS:
+    Generator of (values, indices) array chunks
+    """
+    stream = ExtremaStream(resolution, backend)
+    for block in _blocks(source, block_size):
+        values, indices = stream.push(block)
+        if len(values):
+            yield values, indices
+    values, indices = stream.finish()
+    if len(values):
+        yield values, indices
+
+
+class RainflowCounter(object):
+    """
+    Incremental rainflow counter for signals that arrive in chunks
+
+    Samples are rounded like rainflow() does, their turning points are found
+    across chunk boundaries by an ExtremaStream and pushed straight through
+    the stack based engine. Only the open residue stack, the last two
+    turning points and a Histogram of the closed cycles are kept, so memory
+    does not grow with the length of the signal. Closed cycles are added to
+    the Histogram once FLUSH_SIZE extrema were pushed, so many small pushes
+    do not each merge into the whole histogram.
+    """
+
+    def __init__(self, resolution=0.1, histogram=None, backend='auto'):
+        self.resolution = resolution
+        self.backend = _kernels(backend)[0]
+        if histogram is None:
+            histogram = Histogram(0.1 if resolution is None else resolution)
+        self.__histogram__ = histogram
+        # Closed cycles not yet in the histogram, and the extrema they are of
+        self.__cycles__ = []
+        self.__pending__ = 0
+        self.__stack_v__ = []
+        self.__stack_i__ = []
+        self.__extrema__ = ExtremaStream(resolution, self.backend)
+        self.__finalized__ = False
+
+    @property
+    def samples(self):
+        return self.__extrema__.samples
+
+    @property
+    def histogram(self):
+        """
+        Histogram of the closed cycles
+        """
+        self._flush()
+        return self.__histogram__
+
+    @histogram.setter
+    def histogram(self, histogram):
+        self._flush()
+        self.__histogram__ = histogram
+
+    def _flush(self) -> None:
+        if self.__cycles__:
+            _add_records(self.__histogram__, self.__cycles__)
+            self.__cycles__ = []
+        self.__pending__ = 0
+
+    @property
+    def residue(self):
+        """
+        Tuple (values, indices) of the open residue including the last sample
+        """
+        values, indices = self.__extrema__.pending
+        return (np.concatenate([self.__stack_v__, values]),
+                np.concatenate([self.__stack_i__, indices]))
+
+    def push(self, samples) -> None:
+        """
+        Add an iterable of samples, values that are not numbers are skipped
+        """
+        self.push_array(list(samples))
+
+    def push_array(self, array) -> None:
+        """
+        Add an array of samples
+        """
+        if self.__finalized__:
+            raise RuntimeError('Counter has already been finalized')
+        self.push_extrema(*self.__extrema__.push(array))
+
+    def push_extrema(self, values, indices) -> None:
+        """
+        Add confirmed turning points, e.g. the chunks of iter_extrema
+
+        Not to be mixed with samples pushed through push_array.
+        """
+        if self.__finalized__:
+            raise RuntimeError('Counter has already been finalized')
+        _count_blocks(np.asarray(values, dtype=float), np.asarray(indices),
+                      self.__stack_v__, self.__stack_i__, self.__cycles__,
+                      backend=self.backend)
+        self.__pending__ += len(values)
+        if self.__pending__ >= FLUSH_SIZE:
+            self._flush()
+
+    def snapshot(self):
+        """
+        Histogram of the signal so far with the residue counted as half cycles
+
+        OUTPUT
+        A new Histogram
+        """
+        histogram = self.histogram.copy()
+        _add_records(histogram, self._count_residue(list(self.__stack_v__),
+                                                    list(self.__stack_i__)))
+        return histogram
 
+    def finalize(self):
+        """
+        Count the residue into the histogram, no samples can be added after
 
-def rainflow(sig):
+        OUTPUT
+        The counter's Histogram
+        """
+        if not self.__finalized__:
+            _add_records(self.histogram, self._count_residue(
+                self.__stack_v__, self.__stack_i__))
+            self.__extrema__.finish()
+            self.__finalized__ = True
+        return self.histogram
+
+    def _count_residue(self, stack_v, stack_i) -> list:
+        values, indices = self.__extrema__.pending
+        cycles = []
+        _count_stack(values.tolist(), indices.tolist(), stack_v, stack_i,
+                     cycles)
+        _count_residue(stack_v, stack_i, cycles)
+        del stack_v[:]
+        del stack_i[:]
+        return cycles
+
+
+def count_stream(source, block_size=BLOCK_SIZE, resolution=0.1,
+                 histogram=None, backend='auto'):
+    """
+    Count a signal too long for memory, e.g. a memory mapped array
+
+    The turning points of iter_extrema are counted as they are found, so
+    peak memory depends on block_size and not on the length of the signal.
+
+    INPUTS
+    source: Array, memory mapped array or iterable of samples
+    block_size: Samples read per block
+    resolution: Samples are rounded to a multiple of it, as by rainflow
+    histogram: Optional Histogram to count into, by default of width
+        resolution
+    backend: 'python', 'numba' or 'auto', see rainflow
+
+    OUTPUTS:
+    The filled Histogram, the residue counted as half cycles
+    """
+    counter = RainflowCounter(resolution, histogram, backend)
+    for values, indices in iter_extrema(source, block_size, resolution,
+                                        counter.backend):
+        counter.push_extrema(values, indices)
+    return counter.finalize()
+
+
+ENGINES = ('reference', 'stack')
+
+
+def rainflow(sig, engine='stack', workers=1, histogram=None, progress=None,
+             resolution=0.1, gate=0.0, backend='auto'):
     """
     Find and plot rainflow parameters
 
     INPUTS
-    List or tuple sig: List or tuple containing series signal
+    List, tuple or array sig: Series signal, values that are not numbers
+        are skipped
+    str engine: Counting engine, 'reference' for the Peak and Valley
+        objects or 'stack' for the linear time count_cycles engine
+    int workers: Number of processes to find the extrema and count with.
+        The reference engine counts with at most two, one for the peaks and
+        one for the valleys
+    Histogram histogram: Optional histogram the cycles are added to
+    progress: Optional callable given a Progress at the end of every phase
+        and while counting
+    float resolution: Samples are rounded to a multiple of it, a power of
+        ten rounds like round(). None keeps the samples as they are
+    float gate: Hysteresis gate, reversals smaller than it are removed
+    str backend: 'python', 'numba' for the compiled kernels, or 'auto' to
+        use them when Numba is installed
 
     OUTPUTS:
-    Tuple sig: Original inputted list
-    List peaks: A list containing
+    sig: Extrema of the inputted signal, a tuple for the reference engine
+        and an array for the stack engine
+    CycleTable cycles: The counted cycles, their indices refer to sig. If a
+        histogram was given it is returned filled instead
     """
-    new_sig = []
-    for i, signal in enumerate(sig):
-        try:
-            # Attempt to round of to a 1 decimal place
-            new_sig += [round(float(signal), 1)]
-        except ValueError:
-            pass
+    if engine not in ENGINES:
+        raise ValueError('Unknown engine {!r}, expected one of {}'.format(
+            engine, ', '.join(ENGINES)))
+
+    backend = _kernels(backend)[0]
+    monitor = _Monitor(progress, backend)
 
-    # Convert signal into a tuple of extrema
-    sig = tuple(sig2ext(new_sig))
+    # Round of to the resolution, 1 decimal place by default
+    monitor.begin('preprocess')
+    new_sig = _quantize(sig, resolution)
+    monitor.report()
+
+    # Convert signal into extrema
+    monitor.begin('sig2ext')
+    sig = sig2ext(new_sig, gate=gate, backend=backend, workers=workers)
+    monitor.report(len(sig))
+
+    if engine == 'stack':
+        return sig, count_cycles(sig, workers=workers, histogram=histogram,
+                                 progress=progress, backend=backend)
+
+    monitor.begin('count')
+    sig = tuple(sig.tolist())
 
     # Create a Valley and Peak objects from the extrema signal
     valleys = []
@@ -281,46 +1280,477 @@ def rainflow(sig):
         else:
             peaks += [Peak(value, i, sig)]
 
-    # Run independent rainflow code of separate process
-    with ProcessPoolExecutor(max_workers=2) as pool:
-        pool.submit(eval_peaks, peaks, sig)
-        pool.submit(eval_valleys, valleys, sig)
+    if workers > 1:
+        # Run independent rainflow code of separate process. The objects are
+        # counted in pickled copies, so the evaluated lists have to be
+        # collected from the workers
+        pool = _get_pool(2)
+        peaks_future = pool.submit(eval_peaks, peaks, sig)
+        valleys_future = pool.submit(eval_valleys, valleys, sig)
+        peaks = peaks_future.result()
+        valleys = valleys_future.result()
+    else:
+        eval_peaks(peaks, sig)
+        eval_valleys(valleys, sig)
+    monitor.report(len(sig))
+
+    # Every Peak and Valley is a half cycle from its value to where its flow
+    # ended
+    cycles = [(extrema.value, extrema.position[-1], 0.5, extrema.index,
+               extrema.index_of_position[-1]) for extrema in peaks + valleys]
+    monitor.begin('aggregate')
+    cycles = CycleTable.from_records(cycles, sig)
+    if histogram is not None:
+        cycles = histogram.add_cycles(cycles)
+    monitor.report(len(sig))
+    return sig, cycles
+
+
+def _reversals(sig):
+    """
+    Mask of the reversals together with every point of a plateau
+
+    Works along the last axis, so all channels of a 2-D array are done in
+    one pass. The first and last point are always kept.
+    """
+    w = np.ones(sig.shape, dtype=bool)
+    if sig.shape[-1] > 2:
+        w1 = np.sign(np.diff(sig))
+        w[..., 1:-1] = w1[..., :-1] * w1[..., 1:] <= 0
+    return w
+
+
+def _extrema_index(sig, index):
+    """
+    Reduce the reversals and plateau points at index of sig to its extrema
+    """
+    if len(index) > 2:
+        # Drop the points inside a plateau
+        w1 = np.diff(sig[index])
+        w = np.ones(len(index), dtype=bool)
+        w[1:-1] = (w1[:-1] != 0) | (w1[1:] != 0)
+        index = index[w]
+
+    # Keep only the first point of repeated values
+    ext = sig[index]
+    w = np.ones(len(index), dtype=bool)
+    w[1:] = ext[1:] != ext[:-1]
+    index = index[w]
+
+    if len(index) > 2:
+        # Drop points where the signal does not reverse
+        w1 = np.sign(np.diff(sig[index]))
+        w = np.ones(len(index), dtype=bool)
+        w[1:-1] = w1[:-1] * w1[1:] < 0
+        index = index[w]
+    return index
 
-    return sig, peaks, valleys
+
+def _gate(sig, index, gate):
+    """
+    Hysteresis filter the extrema at index of sig
+
+    A turning point is only kept once the signal has moved away from it by
+    at least gate, so every range between the kept points is at least gate.
+    Smaller reversals are removed together with the cycles they would form.
+    Whether a reversal is kept depends on the points before it, so this is
+    a single scan over the extrema, which are far fewer than the samples.
+    """
+    values = sig[index].tolist()
+    if not values:
+        return index
+    # Ranges of rounded samples are only equal to the gate within rounding
+    # error, e.g. -1.3 - -2.3 < 1.0
+    gate *= 1 - 1e-9
+    kept = []
+    low = high = 0
+    direction = 0
+    for i, value in enumerate(values):
+        if direction > 0:
+            if value > values[high]:
+                high = i
+            elif values[high] - value >= gate:
+                kept += [high]
+                low = i
+                direction = -1
+        elif direction < 0:
+            if value < values[low]:
+                low = i
+            elif value - values[low] >= gate:
+                kept += [low]
+                high = i
+                direction = 1
+        else:
+            # Until the first range reaches the gate the direction is unknown
+            if value > values[high]:
+                high = i
+            if value < values[low]:
+                low = i
+            if values[high] - values[low] >= gate:
+                kept += [min(low, high)]
+                direction = 1 if high > low else -1
+    kept += [high if direction > 0 else low] if direction else [0]
+    return index[kept]
 
 
-def sig2ext(sig):
+def _find_extrema(sig, gate=0.0, kernels=None, reversals=None):
     """
-    Returns a list of all local minima and maxima in input list
-    Inputs: A list or a tuple of signals
-    Output: A list of local extrema signals
+    Index of the extrema of a 1-D sig, hysteresis filtered with gate
+
+    reversals is the mask of _reversals when it was already found.
+    """
+    if kernels is not None:
+        index = kernels.extrema_index(sig)
+        return kernels.gate(sig, index, gate) if gate > 0 else index
+    if reversals is None:
+        reversals = _reversals(sig)
+    index = _extrema_index(sig, np.flatnonzero(reversals))
+    return _gate(sig, index, gate) if gate > 0 else index
+
+
+# Below this many samples per worker sig2ext is not split across processes
+MIN_BLOCK = 1 << 20
+
+
+def _mapped_file(sig):
+    """
+    Tuple (file name, byte offset) of a 1-D memory mapped sig, else None
+    """
+    import mmap
+
+    if isinstance(sig, np.memmap) and isinstance(sig.base, mmap.mmap) and \
+            sig.ndim == 1 and sig.flags.c_contiguous and sig.filename:
+        return sig.filename, sig.offset
+    return None
+
+
+def _extrema_block(sig, start, end, backend):
+    """
+    Index of the extrema of sig[start:end], its first and last point included
+    """
+    return start + _find_extrema(sig[start:end], kernels=_kernels(backend)[1])
+
+
+def _extrema_file(file, dtype, offset, size, start, end, backend):
+    """
+    _extrema_block of a memory mapped file, in a worker process
+    """
+    sig = np.memmap(file, dtype=dtype, mode='r', offset=offset, shape=(size,))
+    return _extrema_block(sig, start, end, backend)
+
+
+def _stitch(sig, blocks):
+    """
+    Extrema of sig from the extrema of its consecutive blocks
+
+    Between two consecutive points of the blocks the signal is monotone, so
+    every point but a block's first and last one was decided on the same
+    neighbours as a serial run would. Only those edge points are checked
+    again: one is kept when it starts a run of equal values that reverses
+    the direction of the signal, or starts the last run.
+    """
+    index = np.concatenate(blocks)
+    ends = np.cumsum([len(block) for block in blocks])
+    edges = sorted(set(ends[:-1].tolist()) | set((ends - 1).tolist()))
+    dropped = []
+    for position in edges:
+        if position == 0:
+            continue
+        value = sig[index[position]]
+        previous = sig[index[position - 1]]
+        if value == previous:
+            dropped += [position]
+            continue
+        following = position + 1
+        while following < len(index) and sig[index[following]] == value:
+            following += 1
+        if following < len(index) and \
+                (value - previous) * (sig[index[following]] - value) >= 0:
+            dropped += [position]
+    return np.delete(index, dropped)
+
+
+def _parallel_extrema(sig, workers, gate=0.0, backend='python', file=None):
+    """
+    Index of the extrema of sig found in blocks by workers
+
+    The workers read the signal where it is: threads share the array, and
+    a memory mapped file, given as file, is mapped again by each process.
+    Only the points at the block edges are checked again by _stitch.
+    """
+    edges = np.linspace(0, len(sig), workers + 1).astype(np.int64).tolist()
+    if file is None:
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(workers) as pool:
+            blocks = list(pool.map(_extrema_block, [sig] * workers,
+                                   edges[:-1], edges[1:], [backend] * workers))
+    else:
+        blocks = list(_get_pool(workers).map(
+            _extrema_file, [file[0]] * workers, [sig.dtype.str] * workers,
+            [file[1]] * workers, [len(sig)] * workers, edges[:-1],
+            edges[1:], [backend] * workers))
+    index = _stitch(sig, blocks)
+    if gate > 0:
+        kernels = _kernels(backend)[1]
+        return _gate(sig, index, gate) if kernels is None else \
+            kernels.gate(sig, index, gate)
+    return index
+
+
+def sig2ext(sig, return_index=False, dtype=None, resolution=None, gate=0.0,
+            backend='auto', workers=1):
+    """
+    Returns an array of all local minima and maxima in input signal
+    Inputs: A list, tuple or array of signals
+        return_index: Also return the index of each extrema in sig
+        dtype: Optional dtype of the output, e.g. np.float32
+        resolution: Optional step the signal is rounded to first
+        gate: Hysteresis gate, reversals smaller than it are removed
+        backend: 'python', 'numba' or 'auto', see rainflow
+        workers: Number of threads, or processes for a memory mapped
+            file, to find the extrema of long signals with, the result is
+            the same as with one
+    Output: An array of local extrema signals, and with return_index the
+        array of their indices in sig
 
     This code was originally written in MATLAB by Evans Djangbah
     This is a slightly modified form which only accepts one signal
     """
-    w1 = np.diff(sig)
-    w = [True] + [True if w1[i]*w1[i+1] <=
-                  0 else False for i in range(len(w1)-1)] + [True]
-    ext = [sig[i] for i, val in enumerate(w) if val is True]
-
-    w1 = np.diff(ext)
-    w = [True] + [False if w1[i] == 0 and w1[i+1] ==
-                  0 else True for i in range(len(w1)-1)] + [True]
-    ext1 = [ext[i] for i, val in enumerate(w) if val is True]
-    ext = ext1
-
-    w = [True] + [False if ext[i] == ext[i+1]
-                  else True for i in range(len(ext)-1)]
-    ext1 = [ext[i] for i, val in enumerate(w) if val is True]
-    ext = ext1
-    del ext1
-
-    if len(ext) > 2:
-        w1 = np.diff(ext)
-        w = [True] + [True if w1[i]*w1[i+1] <
-                      0 else False for i in range(len(w1)-1)] + [True]
-        ext1 = [ext[i] for i, val in enumerate(w) if val is True]
-        ext = ext1
-        del ext1
-
-    return ext
+    if resolution is not None:
+        # Values that are not numbers stay NaN, so the index counts them
+        values = _as_numbers(sig)
+        numbers = ~np.isnan(values)
+        sig = np.full(values.shape, np.nan)
+        sig[numbers] = _quantize(values[numbers], resolution)
+    file = _mapped_file(sig)
+    if file is not None and dtype is not None and np.dtype(dtype) != sig.dtype:
+        # Converted samples are no longer those in the file
+        file = None
+    sig = np.asarray(sig, dtype=dtype)
+    # NaN samples are skipped before either backend sees them, the index
+    # still refers to sig
+    kept = None
+    if sig.dtype.kind == 'f' and sig.ndim == 1:
+        missing = np.isnan(sig)
+        if missing.any():
+            kept = np.flatnonzero(~missing)
+            sig = sig[kept]
+            file = None
+    backend, kernels = _kernels(backend)
+    workers = min(workers, len(sig) // MIN_BLOCK)
+    if workers > 1 and sig.ndim == 1:
+        index = _parallel_extrema(sig, workers, gate, backend, file)
+    else:
+        index = _find_extrema(sig, gate, kernels)
+
+    if return_index:
+        return sig[index], index if kept is None else kept[index]
+    return sig[index]
+
+
+def _count_channel(ext, width=None, backend='python'):
+    """
+    Count one channel's extrema in a worker process
+
+    OUTPUT
+    The structured array of its CycleTable, or a Histogram with width
+    """
+    if width is None:
+        return count_cycles(ext, backend=backend).data
+    return count_cycles(ext, histogram=Histogram(width), backend=backend)
+
+
+def rainflow_batch(array, axis=0, workers=1, width=None, resolution=0.1,
+                   gate=0.0, backend='auto') -> list:
+    """
+    Count every channel of a 2-D array
+
+    The samples are rounded and their reversals found for all channels at
+    once, then each channel is counted on the shared worker pool.
+
+    INPUTS
+    array: 2-D array of samples
+    axis: Axis the samples of a channel run along, 0 when every column is
+        a channel
+    workers: Number of processes to count with
+    width: Optional histogram bin width, to get a Histogram per channel
+        instead of a CycleTable
+    resolution: Samples are rounded to a multiple of it, as by rainflow
+    gate: Hysteresis gate, reversals smaller than it are removed
+    backend: 'python', 'numba' or 'auto', see rainflow
+
+    OUTPUTS:
+    List with a CycleTable, or a Histogram, per channel. The indices of a
+    CycleTable refer to the channel's extrema, which are its signal
+    """
+    data = _quantize(np.moveaxis(np.asarray(array), axis, -1), resolution)
+    if data.ndim != 2:
+        raise ValueError('Expected a 2-D array, got {} dimensions'.format(
+            data.ndim))
+    backend, kernels = _kernels(backend)
+    # The python backend finds the reversals of all channels at once, unless
+    # NaN samples have to be skipped per channel
+    missing = np.isnan(data)
+    if kernels is None and not missing.any():
+        reversals = _reversals(data)
+    else:
+        reversals = [None] * len(data)
+    data = [channel[~skip] for channel, skip in zip(data, missing)]
+    extrema = [channel[_find_extrema(channel, gate, kernels, mask)]
+               for channel, mask in zip(data, reversals)]
+
+    if workers > 1:
+        results = list(_get_pool(workers).map(
+            _count_channel, extrema, [width] * len(extrema),
+            [backend] * len(extrema)))
+    else:
+        results = [_count_channel(ext, width, backend) for ext in extrema]
+    if width is None:
+        results = [CycleTable(result, ext)
+                   for result, ext in zip(results, extrema)]
+    return results
+
+
+class WindowCount(object):
+    """
+    Cycles counted in one window of a signal, or in adjacent windows
+
+    Only the cycles that close inside the window are in histogram, the
+    turning points still open at its end are kept as the residue. Adding
+    the count of the next window pushes the two residues through the stack
+    together, which closes the cycles that span both windows, so any run of
+    windows is combined to exactly the count of its samples.
+
+    start, end: First and one past the last sample of the window
+    histogram: Histogram of the cycles closed inside the window
+    residue_v, residue_i: Values and sample indices of the open residue
+    """
+    __slots__ = ('start', 'end', 'histogram', 'residue_v', 'residue_i')
+
+    def __init__(self, start, end, histogram, residue_v, residue_i):
+        self.start = start
+        self.end = end
+        self.histogram = histogram
+        self.residue_v = residue_v
+        self.residue_i = residue_i
+
+    def __add__(self, other):
+        if other.start != self.end:
+            raise ValueError('Can not merge windows [{}, {}) and [{}, {})'
+                             .format(self.start, self.end, other.start,
+                                     other.end))
+        values = np.concatenate([self.residue_v, other.residue_v])
+        indices = np.concatenate([self.residue_i, other.residue_i])
+        # The ends of the windows need not be turning points of the signal
+        values, ext_i = sig2ext(values, return_index=True, backend='python')
+        cycles = []
+        stack_v = []
+        stack_i = []
+        _count_stack(values.tolist(), indices[ext_i].tolist(), stack_v,
+                     stack_i, cycles)
+        histogram = self.histogram + other.histogram
+        _add_records(histogram, cycles)
+        return WindowCount(self.start, other.end, histogram,
+                           np.array(stack_v, dtype=float),
+                           np.array(stack_i, dtype=np.int64))
+
+    def snapshot(self):
+        """
+        Histogram of the window with its residue counted as half cycles
+
+        OUTPUT
+        A new Histogram
+        """
+        cycles = []
+        _count_residue(self.residue_v.tolist(), self.residue_i.tolist(),
+                       cycles)
+        histogram = self.histogram.copy()
+        _add_records(histogram, cycles)
+        return histogram
+
+
+def merge_windows(windows):
+    """
+    Combine a run of adjacent WindowCounts into one
+    """
+    windows = list(windows)
+    if not windows:
+        raise ValueError('No windows to merge')
+    merged = windows[0]
+    for window in windows[1:]:
+        merged = merged + window
+    return merged
+
+
+def _count_window(values, start, width, backend):
+    """
+    Count one window's samples in a worker process
+    """
+    ext, index = sig2ext(values, return_index=True, backend=backend)
+    histogram, residue_v, residue_i = _count_chunk(ext, index + start, width,
+                                                   backend)
+    return histogram, residue_v, residue_i.astype(np.int64)
+
+
+def count_windows(sig, size=None, edges=None, times=None, width=0.1,
+                  resolution=0.1, workers=1, backend='auto') -> list:
+    """
+    Count a signal in windows of samples or of time
+
+    INPUTS
+    sig: Array of samples
+    size: Number of samples per window, the last window may be shorter
+    edges: Boundaries of the windows instead of size, as sample indices or,
+        with times, as timestamps. Window k runs from edges[k] up to but
+        not including edges[k + 1]
+    times: Optional timestamp of every sample, in increasing order
+    width: Histogram bin width
+    resolution: Samples are rounded to a multiple of it, as by rainflow
+    workers: Number of processes to count the windows with
+    backend: 'python', 'numba' or 'auto', see rainflow
+
+    OUTPUTS:
+    List with a WindowCount per window. merge_windows of any run of them
+    gives the count of those samples alone, and of all of them the count
+    of the whole signal. A hysteresis gate depends on the samples before
+    a window, so it is not offered here
+    """
+    sig = np.asarray(sig)
+    values = _quantize(sig, resolution)
+    if len(values) != len(sig):
+        raise ValueError('Windows need a signal of numbers only')
+    if size is not None:
+        edges = np.append(np.arange(0, len(values), size), len(values))
+    elif edges is None:
+        raise ValueError('Give either size or edges')
+    elif times is not None:
+        if len(times) != len(values):
+            raise ValueError('Expected a timestamp for each of the {} '
+                             'samples, got {}'.format(len(values), len(times)))
+        edges = np.searchsorted(times, edges)
+    edges = np.asarray(edges, dtype=np.int64)
+    if len(edges) < 2 or (np.diff(edges) < 0).any():
+        raise ValueError('Window edges must be increasing')
+
+    backend = _kernels(backend)[0]
+    starts = edges[:-1].tolist()
+    ends = edges[1:].tolist()
+    blocks = [values[start:end] for start, end in zip(starts, ends)]
+    if workers > 1:
+        counts = list(_get_pool(workers).map(
+            _count_window, blocks, starts, [width] * len(blocks),
+            [backend] * len(blocks)))
+    else:
+        counts = [_count_window(block, start, width, backend)
+                  for block, start in zip(blocks, starts)]
+    return [WindowCount(start, end, *count)
+            for start, end, count in zip(starts, ends, counts)]
+
+
+if __name__ == '__main__':
+    # Run the command line through the importable module so worker
+    # processes and results all refer to the same rainflow classes
+    from sys import exit
+    from rainflow_cli import main
+    exit(main())
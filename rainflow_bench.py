@@ -0,0 +1,350 @@
+"""
+-------------------------------------------------------------------------------
+Benchmarks for rainflow counting
+Copyright (C) 2017 Evans Djangbah
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+Contact: Evans Djangbah, Kwame Nkrumah University of Science and Technology
+Email: djangbahevans@gmail.com
+-------------------------------------------------------------------------------
+USAGE:
+Time every stage on synthetic signals and save the results:
+    python rainflow_bench.py --sizes 1e3 1e5 1e7 -o bench.json
+Compare against the results of another commit:
+    python rainflow_bench.py -o new.json --compare bench.json
+The signals are seeded, so runs on different commits count the same data.
+The quadratic reference engine is only run up to --reference-max samples.
+The equivalence check splits the parallel paths over the workers at every
+size, their timings record how many workers the signal really used.
+Import times are measured in fresh interpreters, importing rainflow should
+load nothing heavier than Numpy.
+-------------------------------------------------------------------------------
+DEPENDENCIES:
+- Numpy
+-------------------------------------------------------------------------------
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import rainflow as rf
+
+# Whether Numba is installed, the other stages run on it when it is
+NUMBA = rf._kernels('auto')[0] == 'numba'
+
+
+def random_walk(n, rng):
+    return np.round(rng.standard_normal(n).cumsum(), 1)
+
+
+def sine_noise(n, rng):
+    t = np.arange(n)
+    return np.round(50 * np.sin(2 * np.pi * t / 500) +
+                    rng.standard_normal(n), 1)
+
+
+def block_loading(n, rng):
+    # Blocks of constant amplitude sine loading at random levels
+    t = np.arange(n)
+    amplitude = np.repeat(rng.uniform(1, 100, n // 1000 + 1), 1000)[:n]
+    mean = np.repeat(rng.uniform(-50, 50, n // 1000 + 1), 1000)[:n]
+    return np.round(mean + amplitude * np.sin(2 * np.pi * t / 50), 1)
+
+
+SIGNALS = {'random_walk': random_walk, 'sine_noise': sine_noise,
+           'block_loading': block_loading}
+
+
+def measure(function, *args, repeat=3, **kwargs) -> tuple:
+    """
+    Best time of function over repeat runs and its peak traced memory
+
+    Memory is traced in one extra run, since tracing slows Python down too
+    much to time the same run.
+
+    OUTPUT
+    Tuple (seconds, peak bytes, result of the last run)
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        ts = time.perf_counter()
+        result = function(*args, **kwargs)
+        best = min(best, time.perf_counter() - ts)
+    tracemalloc.start()
+    function(*args, **kwargs)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak, result
+
+
+def _reference(ext):
+    # Build and evaluate the Peak and Valley objects like rainflow() does
+    ext = tuple(ext.tolist())
+    peaks = []
+    valleys = []
+    for i, value in enumerate(ext[:-1]):
+        if rf.isvalley(i, ext):
+            valleys += [rf.Valley(value, i, ext)]
+        else:
+            peaks += [rf.Peak(value, i, ext)]
+    rf.eval_peaks(peaks, ext)
+    rf.eval_valleys(valleys, ext)
+
+
+def _stream(sig, chunk=65536):
+    counter = rf.RainflowCounter()
+    for start in range(0, len(sig), chunk):
+        counter.push_array(sig[start:start + chunk])
+    return counter.finalize()
+
+
+def _half_cycles(cycles) -> list:
+    """
+    Sorted (from, to) of every half cycle, full cycles give one each way
+    """
+    data = cycles.to_numpy()
+    halves = list(zip(data['from'].tolist(), data['to'].tolist()))
+    full = data['count'] == 1.0
+    halves += zip(data['to'][full].tolist(), data['from'][full].tolist())
+    return sorted(halves)
+
+
+def _split(function, *args, **kwargs):
+    """
+    Call function with MIN_CHUNK and MIN_BLOCK lowered, so signals of any
+    length are split over the workers instead of falling back to one
+    """
+    limits = rf.MIN_CHUNK, rf.MIN_BLOCK
+    rf.MIN_CHUNK = rf.MIN_BLOCK = 16
+    try:
+        return function(*args, **kwargs)
+    finally:
+        rf.MIN_CHUNK, rf.MIN_BLOCK = limits
+
+
+def check_equivalence(sig, reference=True, workers=2) -> dict:
+    """
+    Check every engine counts the same half cycles as the reference
+
+    Without reference the stack engine is taken as the expected result, for
+    signals too long for the reference engine. The parallel paths are split
+    over the workers whatever the length of sig.
+
+    OUTPUT
+    Dictionary mapping each engine to whether it matches
+    """
+    engines = rf.ENGINES if reference else [engine for engine in rf.ENGINES
+                                            if engine != 'reference']
+    _, expected = rf.rainflow(sig, engine='reference' if reference else
+                              'stack')
+    expected = _half_cycles(expected)
+    results = {}
+    for engine in engines:
+        results[engine] = _half_cycles(rf.rainflow(
+            sig, engine=engine, backend='python')[1]) == expected
+    if NUMBA:
+        results['numba'] = _half_cycles(
+            rf.rainflow(sig, backend='numba')[1]) == expected
+    results['parallel'] = _half_cycles(
+        _split(rf.rainflow, sig, workers=workers)[1]) == expected
+    serial = rf.sig2ext(sig, return_index=True)
+    parallel = _split(rf.sig2ext, sig, return_index=True, workers=workers)
+    results['parallel_sig2ext'] = all(
+        np.array_equal(a, b) for a, b in zip(serial, parallel))
+
+    histogram = rf.rainflow(sig, histogram=rf.Histogram())[1]
+    counter = rf.RainflowCounter()
+    for chunk in np.array_split(sig, 7):
+        counter.push_array(chunk)
+    streamed = counter.finalize()
+    results['streaming'] = streamed == histogram
+    return results
+
+
+def run(sizes, signals, repeat=3, reference_max=10000, workers=2,
+        seed=0) -> list:
+    """
+    Time every stage on every signal and size
+
+    OUTPUT
+    List of dictionaries, one per signal, size and stage
+    """
+    records = []
+    for name in signals:
+        for size in sizes:
+            sig = SIGNALS[name](size, np.random.default_rng(seed))
+
+            def record(stage, function, *args, **kwargs):
+                seconds, peak, result = measure(function, *args,
+                                                repeat=repeat, **kwargs)
+                records.append({'signal': name, 'size': size,
+                                'stage': stage, 'seconds': seconds,
+                                'peak_bytes': peak})
+                print('{:<14} {:>11} {:<22} {:10.4f}s {:12d}B'.format(
+                    name, size, stage, seconds, peak), file=sys.stderr)
+                return result
+
+            ext = record('sig2ext', rf.sig2ext, sig, backend='python')
+            record('count_cycles', rf.count_cycles, ext, backend='python')
+            if NUMBA:
+                # The first call compiles, or loads the cached kernels
+                rf.sig2ext(sig[:100], backend='numba')
+                record('sig2ext_numba', rf.sig2ext, sig, backend='numba')
+                record('count_cycles_numba', rf.count_cycles, ext,
+                       backend='numba')
+            # Short signals fall back to one process, the records say how
+            # many the parallel stages really used
+            for stage, function, data, limit in (
+                    ('sig2ext_parallel', rf.sig2ext, sig, rf.MIN_BLOCK),
+                    ('count_cycles_parallel', rf.count_cycles, ext,
+                     rf.MIN_CHUNK)):
+                record(stage, function, data, workers=workers)
+                used = max(1, min(workers, len(data) // limit))
+                records[-1]['workers'] = used
+                if used < workers:
+                    print('{:<14} {:>11} {:<22} ran on {} of {} workers'
+                          .format(name, size, stage, used, workers),
+                          file=sys.stderr)
+            record('count_histogram', rf.count_cycles, ext,
+                   histogram=rf.Histogram())
+            record('rainflow', rf.rainflow, sig)
+            record('streaming', _stream, sig)
+            if size <= reference_max:
+                record('eval_peaks_valleys', _reference, ext)
+                record('rainflow_reference', rf.rainflow, sig,
+                       engine='reference')
+                equivalent = check_equivalence(sig, workers=workers)
+            else:
+                equivalent = check_equivalence(sig, reference=False,
+                                               workers=workers)
+            records.append({'signal': name, 'size': size,
+                            'stage': 'equivalence', 'results': equivalent})
+            if not all(equivalent.values()):
+                print('{} {}: engines differ: {}'.format(name, size,
+                                                         equivalent),
+                      file=sys.stderr)
+    return records
+
+
+# Modules timed on import, and the optional ones they should not pull in
+IMPORTS = ('rainflow', 'rain')
+HEAVY = ('matplotlib', 'PyQt5', 'numba', 'xlrd', 'openpyxl', 'multiprocessing')
+
+IMPORT_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import {}
+seconds = time.perf_counter() - start
+print(seconds, *[m for m in {!r} if m in sys.modules])
+"""
+
+
+def measure_imports(modules=IMPORTS, repeat=3) -> list:
+    """
+    Time importing each module in a fresh interpreter
+
+    OUTPUT
+    List of dictionaries with the best time and the heavy optional modules
+    the import loaded. Modules that can not be imported are left out
+    """
+    records = []
+    for module in modules:
+        times = []
+        for _ in range(repeat):
+            result = subprocess.run(
+                [sys.executable, '-c', IMPORT_SCRIPT.format(module, HEAVY)],
+                capture_output=True, text=True,
+                cwd=os.path.dirname(os.path.abspath(__file__)))
+            if result.returncode:
+                break
+            seconds, *loaded = result.stdout.split()
+            times.append(float(seconds))
+        if not times:
+            continue
+        records.append({'signal': 'import', 'size': 0,
+                        'stage': 'import_' + module, 'seconds': min(times),
+                        'loaded': loaded})
+        print('{:<14} {:>11} {:<22} {:10.4f}s {}'.format(
+            'import', 0, module, min(times), ' '.join(loaded)),
+            file=sys.stderr)
+    return records
+
+
+def compare(records, baseline) -> None:
+    """
+    Print the time of every stage relative to a baseline run
+    """
+    times = {(r['signal'], r['size'], r['stage']): r['seconds']
+             for r in baseline['records'] if 'seconds' in r}
+    print('{:<14} {:>11} {:<22} {:>8}'.format('signal', 'size', 'stage',
+                                              'ratio'))
+    for r in records:
+        key = (r['signal'], r['size'], r['stage'])
+        if key in times and 'seconds' in r:
+            print('{:<14} {:>11} {:<22} {:8.2f}'.format(
+                *key, r['seconds'] / times[key]))
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'],
+                              capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description='Benchmark rainflow counting on synthetic signals')
+    parser.add_argument('--sizes', nargs='+', type=float,
+                        default=[1e3, 1e4, 1e5, 1e6],
+                        help='signal lengths, up to 1e8')
+    parser.add_argument('--signals', nargs='+', choices=sorted(SIGNALS),
+                        default=sorted(SIGNALS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--reference-max', type=float, default=1e4,
+                        help='largest signal counted by the reference engine')
+    parser.add_argument('-j', '--workers', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', help='JSON file for the results')
+    parser.add_argument('--compare', help='JSON results to compare against')
+    args = parser.parse_args(argv)
+
+    records = measure_imports(repeat=args.repeat)
+    records += run([int(size) for size in args.sizes], args.signals,
+                   args.repeat, args.reference_max, args.workers, args.seed)
+    results = {'commit': _commit(), 'python': platform.python_version(),
+               'numpy': np.__version__, 'machine': platform.machine(),
+               'backend': 'numba' if NUMBA else 'python',
+               'records': records}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(records, json.load(f))
+
+    equivalent = all(all(r['results'].values()) for r in records
+                     if r['stage'] == 'equivalence')
+    return 0 if equivalent else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,238 @@
+"""
+-------------------------------------------------------------------------------
+Result cache for rainflow counting
+Copyright (C) 2017 Evans Djangbah
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+Contact: Evans Djangbah, Kwame Nkrumah University of Science and Technology
+Email: djangbahevans@gmail.com
+-------------------------------------------------------------------------------
+USAGE:
+Count through a cache so unchanged signals are only counted once:
+    import rainflow_cache as rc
+    cache = rc.ResultCache('~/.cache/rainflow')
+    ext, cycles = rc.cached_rainflow(sig, cache)
+Results are keyed by a hash of the signal together with the counting
+parameters, and kept in memory and, with a directory, on disk. Both are
+least recently used caches with a size cap.
+-------------------------------------------------------------------------------
+DEPENDENCIES:
+- Numpy
+-------------------------------------------------------------------------------
+"""
+
+import hashlib
+import inspect
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from rainflow import CycleTable, Histogram, rainflow
+
+# Part of every key, raise it when rainflow() counts differently so results
+# cached by older versions are not used
+CACHE_VERSION = 1
+
+# Arguments of rainflow() that do not change its result
+IGNORED_PARAMETERS = ('workers', 'progress', 'backend')
+
+
+def signal_key(sig, **parameters) -> str:
+    """
+    Hash of the signal's values and the counting parameters
+
+    Parameters that are not given are hashed with their default in
+    rainflow(), so passing a default gives the same key as leaving it out.
+
+    INPUT
+    sig: List, tuple or array of samples
+    parameters: Counting parameters, e.g. engine='stack'
+
+    OUTPUT
+    Hexadecimal key
+    """
+    bound = inspect.signature(rainflow).bind(sig, **parameters)
+    bound.apply_defaults()
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(repr(('version', CACHE_VERSION)).encode())
+    array = np.asarray(sig)
+    if array.dtype.kind in 'OUS':
+        # Mixed lists, e.g. with empty cells, are hashed by their text
+        digest.update(repr(array.tolist()).encode())
+    else:
+        digest.update(str((array.dtype.str, array.shape)).encode())
+        digest.update(np.ascontiguousarray(array).data)
+    for name, value in sorted(bound.arguments.items()):
+        if name != 'sig' and name not in IGNORED_PARAMETERS:
+            digest.update(repr((name, value)).encode())
+    return digest.hexdigest()
+
+
+def _nbytes(result) -> int:
+    ext, counted = result
+    if isinstance(counted, Histogram):
+        size = counted.froms.nbytes + counted.tos.nbytes + counted.counts.nbytes
+    else:
+        size = counted.data.nbytes
+    return size + np.asarray(ext).nbytes
+
+
+class ResultCache(object):
+    """
+    Least recently used cache of rainflow() results in memory and on disk
+
+    max_bytes caps the memory used by results held in memory, and
+    max_disk_bytes the size of the result files in directory. The least
+    recently used results are evicted first.
+    """
+
+    def __init__(self, directory=None, max_bytes=256 << 20,
+                 max_disk_bytes=4 << 30):
+        self.directory = None if directory is None else \
+            os.path.expanduser(directory)
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.__entries__ = OrderedDict()
+        self.__bytes__ = 0
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def __len__(self):
+        return len(self.__entries__)
+
+    def __contains__(self, key):
+        return key in self.__entries__ or (
+            self.directory is not None and os.path.exists(self._path(key)))
+
+    def _path(self, key) -> str:
+        return os.path.join(self.directory, key + '.npz')
+
+    def get(self, key):
+        """
+        The cached result of key, or None
+        """
+        if key in self.__entries__:
+            self.__entries__.move_to_end(key)
+            return self.__entries__[key]
+        if self.directory is None:
+            return None
+        try:
+            result = self._read(self._path(key))
+        except (OSError, ValueError, KeyError):
+            return None
+        # Mark the file as recently used
+        os.utime(self._path(key))
+        self._remember(key, result)
+        return result
+
+    def put(self, key, result) -> None:
+        """
+        Cache a (sig, cycles) result of rainflow()
+        """
+        self._remember(key, result)
+        if self.directory is not None:
+            self._write(self._path(key), result)
+            self._evict_disk()
+
+    def clear(self) -> None:
+        self.__entries__.clear()
+        self.__bytes__ = 0
+        if self.directory is not None:
+            for name in os.listdir(self.directory):
+                if name.endswith('.npz'):
+                    os.remove(os.path.join(self.directory, name))
+
+    def _remember(self, key, result) -> None:
+        if key in self.__entries__:
+            self.__bytes__ -= _nbytes(self.__entries__.pop(key))
+        self.__entries__[key] = result
+        self.__bytes__ += _nbytes(result)
+        while self.__bytes__ > self.max_bytes and len(self.__entries__) > 1:
+            _, evicted = self.__entries__.popitem(last=False)
+            self.__bytes__ -= _nbytes(evicted)
+
+    def _evict_disk(self) -> None:
+        files = [os.path.join(self.directory, name)
+                 for name in os.listdir(self.directory)
+                 if name.endswith('.npz')]
+        files = sorted((os.stat(file).st_mtime, os.stat(file).st_size, file)
+                       for file in files)
+        total = sum(size for _, size, _ in files)
+        for _, size, file in files[:-1]:
+            if total <= self.max_disk_bytes:
+                break
+            os.remove(file)
+            total -= size
+
+    @staticmethod
+    def _write(path, result) -> None:
+        ext, counted = result
+        if isinstance(counted, Histogram):
+            arrays = {'width': counted.width, 'froms': counted.froms,
+                      'tos': counted.tos, 'counts': counted.counts}
+        else:
+            arrays = {'cycles': counted.data}
+        # Write to a temporary file first so a crash never leaves a
+        # truncated entry behind
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            np.savez(f, ext=np.asarray(ext), **arrays)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _read(path):
+        with np.load(path) as data:
+            ext = data['ext']
+            if 'cycles' in data:
+                return ext, CycleTable(data['cycles'], ext)
+            histogram = Histogram(float(data['width']))
+            histogram.froms = data['froms']
+            histogram.tos = data['tos']
+            histogram.counts = data['counts']
+            return ext, histogram
+
+
+# Cache used when none is given
+default_cache = ResultCache()
+
+
+def cached_rainflow(sig, cache=None, **parameters):
+    """
+    rainflow() that returns a cached result for signals counted before
+
+    INPUTS
+    sig: Series signal
+    cache: ResultCache to use, default_cache when not given
+    parameters: Arguments of rainflow()
+
+    OUTPUTS:
+    The result of rainflow(sig, **parameters). A given histogram is filled
+    like rainflow() does
+    """
+    if cache is None:
+        cache = default_cache
+    histogram = parameters.pop('histogram', None)
+    key_parameters = dict(parameters)
+    if histogram is not None:
+        key_parameters['histogram'] = histogram.width
+    key = signal_key(sig, **key_parameters)
+
+    result = cache.get(key)
+    if result is None:
+        if histogram is not None:
+            parameters['histogram'] = Histogram(histogram.width)
+        result = rainflow(sig, **parameters)
+        cache.put(key, result)
+    if histogram is not None:
+        histogram += result[1]
+        return result[0], histogram
+    return result
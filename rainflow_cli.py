@@ -0,0 +1,157 @@
+"""
+-------------------------------------------------------------------------------
+Batch rainflow counting from the command line
+Copyright (C) 2017 Evans Djangbah
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+Contact: Evans Djangbah, Kwame Nkrumah University of Science and Technology
+Email: djangbahevans@gmail.com
+-------------------------------------------------------------------------------
+USAGE:
+Count every column of every matching file without the GUI:
+    python -m rainflow 'logs/*.xlsx' 'logs/*.csv' 'logs/*.npy' -o results
+Each input file gets a results/<file name>.rfr result file, see
+rainflow_store, holding the histogram, cycle table and extrema of every
+channel.
+Files whose results are newer than the input and were counted with the same
+--width and --stream are skipped unless --force is given. With --stream
+files are counted block by block and only the histograms are written. The
+histograms of many results are summed with:
+    rainflow_store.aggregate(glob.glob('results/*.rfr'))
+-------------------------------------------------------------------------------
+DEPENDENCIES:
+- Numpy
+- rainflow_loaders
+- rainflow_store
+-------------------------------------------------------------------------------
+"""
+
+import argparse
+import glob
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from rainflow import Histogram, count_cycles, sig2ext
+from rainflow_loaders import count_channels, read_channels
+from rainflow_store import ResultFile, write_results
+
+
+def output_path(file, out_dir) -> str:
+    # Keep the extension so test.csv and test.npy do not share results
+    return os.path.join(out_dir, os.path.basename(file) + '.rfr')
+
+
+def is_up_to_date(file, out_dir, width=0.1, stream=False) -> bool:
+    """
+    Check whether the results of file are newer than the file itself and
+    were counted with the same width and stream
+    """
+    out = output_path(file, out_dir)
+    if not os.path.exists(out) or \
+            os.path.getmtime(out) < os.path.getmtime(file):
+        return False
+    try:
+        meta = ResultFile(out).meta
+    except (ValueError, struct.error):
+        # Unreadable results are counted again
+        return False
+    return meta.get('width') == width and meta.get('stream') == stream
+
+
+def count_file(file, out_dir, width=0.1, stream=False) -> tuple:
+    """
+    Count every channel of file and write the results to out_dir
+
+    With stream the file is counted block by block into histograms only,
+    which keeps memory bounded for files larger than memory.
+
+    OUTPUT
+    Tuple (file, number of channels, seconds taken)
+    """
+    ts = time.time()
+    tables = []
+    extrema = []
+    if stream:
+        histograms = count_channels(file, width=width)
+    else:
+        histograms = []
+        for channel in read_channels(file):
+            # Counted like rainflow(channel), keeping the sample index of
+            # every extrema so the table can be mapped back to the samples
+            ext, index = sig2ext(channel, return_index=True, resolution=0.1)
+            cycles = count_cycles(ext)
+            histograms.append(Histogram(width).add_cycles(cycles))
+            tables.append(cycles)
+            extrema.append((ext, index))
+    write_results(output_path(file, out_dir), histograms, tables,
+                  meta={'source': os.path.abspath(file), 'width': width,
+                        'stream': stream}, extrema=extrema)
+    return file, len(histograms), time.time() - ts
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m rainflow',
+        description='Rainflow count every channel of many files')
+    parser.add_argument('patterns', nargs='+', metavar='pattern',
+                        help='glob of input files, e.g. "logs/*.xlsx"')
+    parser.add_argument('-o', '--output', default='.',
+                        help='directory the results are written to')
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(),
+                        help='number of files counted at once')
+    parser.add_argument('--width', type=float, default=0.1,
+                        help='histogram bin width')
+    parser.add_argument('--stream', action='store_true',
+                        help='count in blocks and only write histograms')
+    parser.add_argument('-f', '--force', action='store_true',
+                        help='recount files whose results are up to date')
+    args = parser.parse_args(argv)
+
+    files = []
+    for pattern in args.patterns:
+        # Directories, e.g. the output directory in 'dir/*', are not inputs
+        files += sorted(filter(os.path.isfile,
+                               glob.glob(pattern, recursive=True)))
+    # Count each file once even if several patterns match it
+    files = list(dict.fromkeys(files))
+    if not files:
+        print('No files match {}'.format(' '.join(args.patterns)),
+              file=sys.stderr)
+        return 1
+
+    os.makedirs(args.output, exist_ok=True)
+    todo = [file for file in files
+            if args.force or not is_up_to_date(file, args.output,
+                                               args.width, args.stream)]
+    print('Counting {} of {} files, {} up to date'.format(
+        len(todo), len(files), len(files) - len(todo)))
+
+    ts = time.time()
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(count_file, file, args.output, args.width,
+                               args.stream): file
+                   for file in todo}
+        for future in as_completed(futures):
+            try:
+                file, channels, took = future.result()
+            except Exception as error:
+                failed += 1
+                print('{}: failed: {}'.format(futures[future], error),
+                      file=sys.stderr)
+            else:
+                print('{}: {} channels, took {:.3f}s'.format(
+                    file, channels, took))
+    print('Took {:.3f}s'.format(time.time() - ts))
+    return 1 if failed else 0
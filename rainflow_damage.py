@@ -0,0 +1,215 @@
+"""
+-------------------------------------------------------------------------------
+Fatigue damage of rainflow histograms
+Copyright (C) 2017 Evans Djangbah
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+Contact: Evans Djangbah, Kwame Nkrumah University of Science and Technology
+Email: djangbahevans@gmail.com
+-------------------------------------------------------------------------------
+USAGE:
+Palmgren-Miner damage of a counted histogram on an S-N curve S**m * N = C:
+    import rainflow_damage as rd
+    curve = rd.SNCurve(m=3, C=2e12)
+    ext, histogram = rf.rainflow(sig, histogram=rf.Histogram(0.1))
+    d = rd.damage(histogram, curve)
+or on a Basquin curve with a Goodman mean stress correction:
+    curve = rd.SNCurve.basquin(sigma_f=900, b=-0.1)
+    d = rd.damage(histogram, curve, correction='goodman', ultimate=600)
+Damage of a signal that arrives in chunks, kept up to date per chunk:
+    accumulator = rd.DamageAccumulator(curve)
+    accumulator.push(chunk)
+    d = accumulator.damage
+The signal is taken to be in the units of the S-N curve's stress.
+-------------------------------------------------------------------------------
+DEPENDENCIES:
+- Numpy
+-------------------------------------------------------------------------------
+"""
+
+import numpy as np
+
+from rainflow import FLUSH_SIZE, Histogram, RainflowCounter
+
+
+class SNCurve(object):
+    """
+    S-N curve S**m * N = C giving the cycles to failure N at stress S
+
+    S is the stress range, or the stress amplitude with amplitude=True.
+    Cycles of a stress below limit, the endurance limit, do no damage.
+    """
+
+    def __init__(self, m, C, amplitude=False, limit=0.0):
+        self.m = m
+        self.C = C
+        self.amplitude = amplitude
+        self.limit = limit
+
+    @classmethod
+    def basquin(cls, sigma_f, b, limit=0.0):
+        """
+        Basquin curve amplitude = sigma_f * (2 * N) ** b
+
+        INPUT
+        sigma_f: Fatigue strength coefficient
+        b: Fatigue strength exponent, negative
+        limit: Endurance limit amplitude
+
+        OUTPUT
+        SNCurve of stress amplitude
+        """
+        m = -1.0 / b
+        return cls(m, sigma_f ** m / 2, amplitude=True, limit=limit)
+
+    def cycles(self, stress):
+        """
+        Cycles to failure at each stress, inf below the endurance limit
+        """
+        stress = np.asarray(stress, dtype=float)
+        with np.errstate(divide='ignore'):
+            cycles = self.C / stress ** self.m
+        return np.where(stress < self.limit, np.inf, cycles)
+
+
+def goodman(amplitude, mean, ultimate):
+    """
+    Fully reversed amplitude of amplitude at mean, by the Goodman line
+
+    Compressive means are taken as zero, which is conservative. At a mean of
+    ultimate or above the amplitude is infinite, the material has failed.
+    """
+    factor = 1 - np.maximum(mean, 0) / ultimate
+    with np.errstate(divide='ignore'):
+        return np.where(factor > 0, amplitude / factor, np.inf)
+
+
+def gerber(amplitude, mean, ultimate):
+    """
+    Fully reversed amplitude of amplitude at mean, by the Gerber parabola
+
+    At a mean of ultimate or above, in tension or compression, the amplitude
+    is infinite, the material has failed.
+    """
+    factor = 1 - (mean / ultimate) ** 2
+    with np.errstate(divide='ignore'):
+        return np.where(factor > 0, amplitude / factor, np.inf)
+
+
+CORRECTIONS = {'goodman': goodman, 'gerber': gerber}
+
+
+def bin_damage(histogram, curve, correction=None, ultimate=None):
+    """
+    Palmgren-Miner damage of every from-to bin pair of histogram
+
+    INPUT
+    histogram: Histogram of counted cycles
+    curve: SNCurve
+    correction: Optional mean stress correction, 'goodman', 'gerber' or a
+        function (amplitude, mean, ultimate) -> fully reversed amplitude
+    ultimate: Ultimate strength used by the correction
+
+    OUTPUT
+    Array of the damage of each pair in histogram.froms and histogram.tos,
+    inf for pairs whose mean reaches ultimate
+    """
+    amplitudes = np.abs(histogram.tos - histogram.froms) * histogram.width / 2
+    if correction is not None:
+        if ultimate is None:
+            raise ValueError('A mean stress correction needs ultimate')
+        correction = CORRECTIONS.get(correction, correction)
+        means = (histogram.froms + histogram.tos) * histogram.width / 2
+        amplitudes = correction(amplitudes, means, ultimate)
+    stress = amplitudes if curve.amplitude else 2 * amplitudes
+    # Every pair holds its cycles as counts, half cycles count 0.5
+    with np.errstate(divide='ignore'):
+        return histogram.counts / curve.cycles(stress)
+
+
+def damage(histogram, curve, correction=None, ultimate=None) -> float:
+    """
+    Palmgren-Miner damage sum of histogram, failure is expected at 1.0
+
+    See bin_damage for the inputs.
+    """
+    return float(bin_damage(histogram, curve, correction, ultimate).sum())
+
+
+class DamageAccumulator(object):
+    """
+    Damage of a signal that arrives in chunks
+
+    The cycles closed by the chunks are counted into their own Histogram
+    whose damage is added to the total once FLUSH_SIZE samples were pushed,
+    so the damage is updated without going over the cycles counted before.
+    The cycles closed since, and the open residue counted as half cycles,
+    are added whenever the damage is asked for.
+    """
+
+    def __init__(self, curve, correction=None, ultimate=None, resolution=0.1,
+                 backend='auto'):
+        self.curve = curve
+        self.correction = correction
+        self.ultimate = ultimate
+        self.__counter__ = RainflowCounter(resolution, backend=backend)
+        self.histogram = Histogram(self.__counter__.histogram.width)
+        # Damage of the closed cycles in histogram
+        self.closed = 0.0
+        # Samples pushed since the counter's histogram was last taken
+        self.__pending__ = 0
+
+    def _damage(self, histogram) -> float:
+        return damage(histogram, self.curve, self.correction, self.ultimate)
+
+    @property
+    def damage(self) -> float:
+        """
+        Damage so far with the residue counted as half cycles
+        """
+        return self.closed + self._damage(self.__counter__.snapshot())
+
+    def add(self, histogram) -> None:
+        """
+        Add the damage of already counted cycles, e.g. of another channel
+        section or worker
+        """
+        self.closed += self._damage(histogram)
+        self.histogram += histogram
+
+    def push(self, samples) -> None:
+        """
+        Count an iterable of samples, values that are not numbers are skipped
+        """
+        self.push_array(list(samples))
+
+    def push_array(self, array) -> None:
+        """
+        Count an array of samples
+        """
+        counter = self.__counter__
+        counter.push_array(array)
+        self.__pending__ += len(array)
+        if self.__pending__ >= FLUSH_SIZE:
+            self.add(counter.histogram)
+            counter.histogram = Histogram(self.histogram.width)
+            self.__pending__ = 0
+
+    def finalize(self) -> float:
+        """
+        Count the residue, no samples can be added after
+
+        OUTPUT
+        The total damage
+        """
+        self.add(self.__counter__.finalize())
+        self.__counter__.histogram = Histogram(self.histogram.width)
+        return self.closed
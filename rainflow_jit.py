@@ -0,0 +1,178 @@
+"""
+-------------------------------------------------------------------------------
+Numba compiled kernels for rainflow counting
+Copyright (C) 2017 Evans Djangbah
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+Contact: Evans Djangbah, Kwame Nkrumah University of Science and Technology
+Email: djangbahevans@gmail.com
+-------------------------------------------------------------------------------
+USAGE:
+Not used directly, rainflow imports this module the first time a count is
+run with backend='numba' or backend='auto' and Numba is installed:
+    ext, cycles = rf.rainflow(sig, backend='numba')
+The kernels give exactly the results of the NumPy and pure Python ones.
+Compiled code is cached next to this file, so only the very first call
+pays for compilation.
+-------------------------------------------------------------------------------
+DEPENDENCIES:
+- Numpy
+- Numba
+-------------------------------------------------------------------------------
+"""
+
+import numpy as np
+from numba import njit
+
+
+@njit(cache=True, nogil=True)
+def _extrema_index(sig):
+    index = np.empty(len(sig), dtype=np.int64)
+    if len(sig) == 0:
+        return index
+    index[0] = 0
+    count = 1
+    previous = sig[0]
+    # Start of the current run of equal values and the direction into it
+    start = 0
+    direction = 0
+    for i in range(1, len(sig)):
+        value = sig[i]
+        if value == previous:
+            continue
+        step = 1 if value > previous else -1
+        if direction != 0 and step != direction:
+            index[count] = start
+            count += 1
+        direction = step
+        start = i
+        previous = value
+    if start > 0:
+        index[count] = start
+        count += 1
+    return index[:count]
+
+
+def extrema_index(sig):
+    """
+    Index of the extrema of sig in one pass, the first of a plateau is used
+
+    Gives the same index as rainflow's vectorized reversal passes.
+    """
+    return _extrema_index(np.ascontiguousarray(sig))
+
+
+@njit(cache=True, nogil=True)
+def _gate(values, gate):
+    kept = np.empty(len(values), dtype=np.int64)
+    count = 0
+    low = 0
+    high = 0
+    direction = 0
+    for i in range(len(values)):
+        value = values[i]
+        if direction > 0:
+            if value > values[high]:
+                high = i
+            elif values[high] - value >= gate:
+                kept[count] = high
+                count += 1
+                low = i
+                direction = -1
+        elif direction < 0:
+            if value < values[low]:
+                low = i
+            elif value - values[low] >= gate:
+                kept[count] = low
+                count += 1
+                high = i
+                direction = 1
+        else:
+            if value > values[high]:
+                high = i
+            if value < values[low]:
+                low = i
+            if values[high] - values[low] >= gate:
+                kept[count] = min(low, high)
+                count += 1
+                direction = 1 if high > low else -1
+    if direction > 0:
+        kept[count] = high
+    elif direction < 0:
+        kept[count] = low
+    else:
+        kept[count] = 0
+    return kept[:count + 1]
+
+
+def gate(sig, index, gate):
+    """
+    Hysteresis filter the extrema at index of sig, see rainflow._gate
+    """
+    if not len(index):
+        return index
+    return index[_gate(np.ascontiguousarray(sig[index]), gate * (1 - 1e-9))]
+
+
+@njit(cache=True)
+def _count_stack(values, indices, stack_v, stack_i, top):
+    # Every full cycle takes two points off the stack
+    records = np.empty(((top + len(values)) // 2, 5))
+    count = 0
+    for k in range(len(values)):
+        stack_v[top] = values[k]
+        stack_i[top] = indices[k]
+        top += 1
+        while top >= 4:
+            b = stack_v[top - 3]
+            c = stack_v[top - 2]
+            x = abs(c - b)
+            if x <= abs(b - stack_v[top - 4]) and \
+                    x <= abs(stack_v[top - 1] - c):
+                records[count, 0] = b
+                records[count, 1] = c
+                records[count, 2] = 1.0
+                records[count, 3] = stack_i[top - 3]
+                records[count, 4] = stack_i[top - 2]
+                count += 1
+                stack_v[top - 3] = stack_v[top - 1]
+                stack_i[top - 3] = stack_i[top - 1]
+                top -= 2
+            else:
+                break
+    return records[:count], top
+
+
+def count_stack(values, indices, stack_v, stack_i, cycles):
+    """
+    Compiled rainflow._count_stack for arrays of extrema
+
+    INPUT
+    values, indices: Arrays of extrema values and their indices
+    stack_v, stack_i: Lists of the open residue, updated in place
+    cycles: List the closed (from, to, count, start, end) records are
+        appended to, as one (n, 5) array
+
+    OUTPUT
+    None
+    """
+    top = len(stack_v)
+    size = top + len(values)
+    residue_v = np.empty(size)
+    residue_i = np.empty(size, dtype=np.int64)
+    residue_v[:top] = stack_v
+    residue_i[:top] = stack_i
+    records, top = _count_stack(np.asarray(values, dtype=float),
+                                np.asarray(indices, dtype=np.int64),
+                                residue_v, residue_i, top)
+    stack_v[:] = residue_v[:top].tolist()
+    stack_i[:] = residue_i[:top].tolist()
+    cycles.append(records)
@@ -0,0 +1,219 @@
+"""
+-------------------------------------------------------------------------------
+Columnar signal loaders for rainflow counting
+Copyright (C) 2017 Evans Djangbah
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+Contact: Evans Djangbah, Kwame Nkrumah University of Science and Technology
+Email: djangbahevans@gmail.com
+-------------------------------------------------------------------------------
+USAGE:
+Every column of a file is a channel. Files are read in blocks of rows, so
+a channel can be counted without holding the whole file in memory:
+    import rainflow_loaders as rl
+    histograms = rl.count_channels('test.csv')
+or read in full, .npy files as memory mapped views:
+    channels = rl.read_channels('test.npy')
+Supported files are .npy, .csv/.txt, raw little endian float .f4/.f8 and
+Excel .xls/.xlsx.
+-------------------------------------------------------------------------------
+DEPENDENCIES:
+- Numpy
+- xlrd (.xls files) and openpyxl or xlrd (.xlsx files)
+-------------------------------------------------------------------------------
+"""
+
+from itertools import islice
+
+import numpy as np
+
+from rainflow import Histogram, RainflowCounter
+
+# Rows read per block
+CHUNK_ROWS = 1 << 16
+
+BINARY_DTYPES = {'.f4': '<f4', '.f8': '<f8'}
+
+
+def _extension(file) -> str:
+    return '.' + file.rsplit('.', 1)[-1].lower() if '.' in file else ''
+
+
+def _is_number(text) -> bool:
+    try:
+        float(text)
+    except ValueError:
+        return False
+    return True
+
+
+def iter_npy(file, chunk_rows=CHUNK_ROWS):
+    """
+    Blocks of rows of a memory mapped .npy file
+    """
+    data = np.load(file, mmap_mode='r')
+    data = data.reshape(len(data), -1)
+    for start in range(0, len(data), chunk_rows):
+        yield np.asarray(data[start:start + chunk_rows], dtype=float)
+
+
+def iter_binary(file, channels=1, dtype=None, chunk_rows=CHUNK_ROWS):
+    """
+    Blocks of rows of a raw file of interleaved floats
+
+    INPUT
+    file: Path of the file
+    channels: Number of interleaved channels
+    dtype: Sample dtype, by default taken from the .f4 or .f8 extension
+    """
+    if dtype is None:
+        dtype = BINARY_DTYPES.get(_extension(file), '<f8')
+    data = np.memmap(file, dtype=dtype, mode='r').reshape(-1, channels)
+    for start in range(0, len(data), chunk_rows):
+        yield np.asarray(data[start:start + chunk_rows], dtype=float)
+
+
+def iter_csv(file, delimiter=',', chunk_rows=CHUNK_ROWS):
+    """
+    Blocks of rows of a delimited text file, empty cells are nan
+
+    A first line that is not numbers is taken as a header and skipped.
+    """
+    with open(file) as f:
+        first = f.readline()
+        lines = [] if not all(_is_number(cell) or not cell.strip()
+                              for cell in first.split(delimiter)) else [first]
+        while True:
+            lines += islice(f, chunk_rows - len(lines))
+            if not lines:
+                break
+            yield np.genfromtxt(lines, delimiter=delimiter, ndmin=2)
+            lines = []
+
+
+def _excel_rows(file):
+    """
+    Rows of the first sheet of an Excel workbook, streamed where possible
+    """
+    if _extension(file) == '.xlsx':
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            pass
+        else:
+            book = load_workbook(file, read_only=True, data_only=True)
+            try:
+                yield from book.worksheets[0].iter_rows(values_only=True)
+            finally:
+                book.close()
+            return
+
+    from xlrd import open_workbook
+    book = open_workbook(file, on_demand=True)
+    sheet = book.sheet_by_index(0)
+    for row in range(sheet.nrows):
+        yield sheet.row_values(row)
+    book.release_resources()
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def iter_excel(file, chunk_rows=CHUNK_ROWS):
+    """
+    Blocks of rows of the first sheet of an Excel workbook
+
+    Empty and text cells are nan.
+    """
+    rows = _excel_rows(file)
+    while True:
+        block = [[_to_float(value) for value in row]
+                 for row in islice(rows, chunk_rows)]
+        if not block:
+            break
+        width = max(len(row) for row in block)
+        yield np.array([row + [np.nan] * (width - len(row)) for row in block])
+
+
+def iter_blocks(file, chunk_rows=CHUNK_ROWS):
+    """
+    Blocks of rows of any supported file
+
+    OUTPUT
+    Generator of 2-D float arrays with one column per channel, cells
+    without a number are nan
+    """
+    extension = _extension(file)
+    if extension == '.npy':
+        return iter_npy(file, chunk_rows)
+    if extension in BINARY_DTYPES:
+        return iter_binary(file, chunk_rows=chunk_rows)
+    if extension in ('.xls', '.xlsx'):
+        return iter_excel(file, chunk_rows)
+    if extension in ('.csv', '.txt'):
+        return iter_csv(file, chunk_rows=chunk_rows)
+    raise ValueError('Unsupported file type {!r}'.format(file))
+
+
+def read_channels(file) -> list:
+    """
+    Read every column of a file as its own channel
+
+    OUTPUT
+    List of 1-D arrays, one per channel. The columns of a .npy file are
+    memory mapped views, other files are read in full with empty cells
+    left out
+    """
+    if _extension(file) == '.npy':
+        data = np.load(file, mmap_mode='r')
+        return list(data.reshape(len(data), -1).T)
+
+    blocks = list(iter_blocks(file))
+    if not blocks:
+        return []
+    columns = max(block.shape[1] for block in blocks)
+    channels = []
+    for col in range(columns):
+        channel = np.concatenate([block[:, col] for block in blocks
+                                  if block.shape[1] > col])
+        channels.append(channel[~np.isnan(channel)])
+    return channels
+
+
+def count_channels(file, resolution=0.1, width=None,
+                   chunk_rows=CHUNK_ROWS) -> list:
+    """
+    Count every channel of a file block by block
+
+    Only one block of rows is in memory at a time, so files larger than
+    memory can be counted.
+
+    INPUT
+    file: Path of any supported file
+    resolution: Samples are rounded to a multiple of it, as by rainflow
+    width: Bin width of the histograms, by default resolution
+    chunk_rows: Rows read per block
+
+    OUTPUT
+    List of Histograms, one per channel
+    """
+    counters = []
+    for block in iter_blocks(file, chunk_rows):
+        while len(counters) < block.shape[1]:
+            histogram = None if width is None else Histogram(width)
+            counters.append(RainflowCounter(resolution, histogram))
+        for counter, column in zip(counters, block.T):
+            counter.push_array(column[~np.isnan(column)])
+    return [counter.finalize() for counter in counters]
@@ -0,0 +1,249 @@
+"""
+-------------------------------------------------------------------------------
+Binary result files for rainflow counts
+Copyright (C) 2017 Evans Djangbah
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+Contact: Evans Djangbah, Kwame Nkrumah University of Science and Technology
+Email: djangbahevans@gmail.com
+-------------------------------------------------------------------------------
+USAGE:
+Write the counts of every channel of a file in one call:
+    import rainflow_store as rs
+    rs.write_results('test.rfr', histograms, tables=tables)
+Open it memory mapped, nothing is read until an array is used:
+    results = rs.ResultFile('test.rfr')
+    histogram = results.histogram(0)
+    ranges = results.column(0, 'range')
+Sum the histograms of many result files per channel:
+    histograms = rs.aggregate(glob.glob('results/*.rfr'))
+-------------------------------------------------------------------------------
+FORMAT:
+MAGIC, the format version and the size of the header as little endian
+uint32, then a JSON header padded to ALIGN bytes and the arrays, each
+starting on a multiple of ALIGN bytes. The header holds the metadata, the
+histogram width of every channel and the dtype, shape and offset from the
+end of the header of every array. Arrays of channel n are named
+'ch<n>/from', 'ch<n>/to' and 'ch<n>/count' for the histogram bin pairs,
+'ch<n>/cycles/<column>' for the cycle table columns and
+'ch<n>/residue/values' and 'ch<n>/residue/indices' for the open residue
+and 'ch<n>/extrema/values' and 'ch<n>/extrema/indices' for the extrema the
+start and end of the cycle table refer to, with their sample indices.
+-------------------------------------------------------------------------------
+DEPENDENCIES:
+- Numpy
+-------------------------------------------------------------------------------
+"""
+
+import json
+import os
+import struct
+
+import numpy as np
+
+from rainflow import CYCLE_DTYPE, CycleTable, Histogram
+
+MAGIC = b'RAINFLOW'
+VERSION = 1
+ALIGN = 64
+
+_PREAMBLE = struct.Struct('<8sII')
+
+
+def _aligned(size) -> int:
+    return -(-size // ALIGN) * ALIGN
+
+
+def write_results(path, histograms=(), tables=(), residues=(),
+                  meta=None, extrema=()) -> None:
+    """
+    Write the counts of one or more channels to a result file
+
+    INPUT
+    path: File to write, replaced in one step once it is complete
+    histograms: Histogram of each channel
+    tables: Optional CycleTable of each channel
+    residues: Optional (values, indices) residue of each channel, e.g. of a
+        WindowCount or RainflowCounter.residue
+    meta: Optional dictionary saved in the header, e.g. the source file
+    extrema: Optional (values, indices) of each channel's extrema, e.g. of
+        sig2ext(..., return_index=True). The start and end of a CycleTable
+        index the values, indices maps them to the samples
+
+    OUTPUT
+    None
+    """
+    histograms = list(histograms)
+    tables = list(tables)
+    residues = list(residues)
+    extrema = list(extrema)
+    channels = max(len(histograms), len(tables), len(residues), len(extrema))
+
+    arrays = []
+    for n, histogram in enumerate(histograms):
+        arrays += [('ch{}/from'.format(n), histogram.froms),
+                   ('ch{}/to'.format(n), histogram.tos),
+                   ('ch{}/count'.format(n), histogram.counts)]
+    for n, table in enumerate(tables):
+        data = table.to_numpy()
+        arrays += [('ch{}/cycles/{}'.format(n, name), data[name])
+                   for name in CYCLE_DTYPE.names]
+    for n, (values, indices) in enumerate(residues):
+        arrays += [('ch{}/residue/values'.format(n), values),
+                   ('ch{}/residue/indices'.format(n), indices)]
+    for n, (values, indices) in enumerate(extrema):
+        arrays += [('ch{}/extrema/values'.format(n), values),
+                   ('ch{}/extrema/indices'.format(n), indices)]
+
+    entries = []
+    offset = 0
+    for name, array in arrays:
+        array = np.ascontiguousarray(array)
+        entries.append([name, array.dtype.str, list(array.shape), offset])
+        offset = _aligned(offset + array.nbytes)
+    header = json.dumps({'meta': meta or {}, 'channels': channels,
+                         'widths': [h.width for h in histograms],
+                         'arrays': entries}).encode()
+    header += b' ' * (_aligned(_PREAMBLE.size + len(header)) -
+                      _PREAMBLE.size - len(header))
+
+    # Write to a temporary file first so a reader never sees half a result
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(_PREAMBLE.pack(MAGIC, VERSION, len(header)))
+        f.write(header)
+        start = f.tell()
+        for (name, array), entry in zip(arrays, entries):
+            f.seek(start + entry[3])
+            np.ascontiguousarray(array).tofile(f)
+        f.truncate(start + offset)
+    os.replace(tmp, path)
+
+
+class ResultFile(object):
+    """
+    Memory mapped result file written by write_results
+
+    Arrays are views of the mapped file, so opening thousands of results
+    costs only their headers until their arrays are used.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            magic, version, size = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+            if magic != MAGIC:
+                raise ValueError('{} is not a rainflow result file'.format(
+                    path))
+            if version > VERSION:
+                raise ValueError('{} is version {}, newer than {}'.format(
+                    path, version, VERSION))
+            header = json.loads(f.read(size).decode())
+        self.version = version
+        self.meta = header['meta']
+        self.channels = header['channels']
+        self.widths = header['widths']
+        self.__start__ = _PREAMBLE.size + size
+        self.__arrays__ = {name: (dtype, shape, offset)
+                           for name, dtype, shape, offset in header['arrays']}
+        self.__map__ = None
+
+    def __contains__(self, name):
+        return name in self.__arrays__
+
+    @property
+    def names(self):
+        return list(self.__arrays__)
+
+    def array(self, name):
+        """
+        Read only view of an array of the file
+        """
+        dtype, shape, offset = self.__arrays__[name]
+        if self.__map__ is None:
+            self.__map__ = np.memmap(self.path, dtype=np.uint8, mode='r')
+        dtype = np.dtype(dtype)
+        count = int(np.prod(shape))
+        return np.frombuffer(self.__map__, dtype=dtype, count=count,
+                             offset=self.__start__ + offset).reshape(shape)
+
+    def histogram(self, n):
+        """
+        Histogram of channel n, its bin pairs are views of the file
+        """
+        histogram = Histogram(self.widths[n])
+        histogram.froms = self.array('ch{}/from'.format(n))
+        histogram.tos = self.array('ch{}/to'.format(n))
+        histogram.counts = self.array('ch{}/count'.format(n))
+        return histogram
+
+    def column(self, n, name):
+        """
+        One column of the cycle table of channel n, e.g. 'range'
+        """
+        return self.array('ch{}/cycles/{}'.format(n, name))
+
+    def cycles(self, n):
+        """
+        CycleTable of channel n, or None if it was not saved
+
+        The columns are copied into the table, use column for views. When
+        the extrema were saved they are the table's signal.
+        """
+        if 'ch{}/cycles/from'.format(n) not in self:
+            return None
+        first = self.column(n, 'from')
+        data = np.empty(len(first), dtype=CYCLE_DTYPE)
+        for name in CYCLE_DTYPE.names:
+            data[name] = self.column(n, name)
+        extrema = self.extrema(n)
+        return CycleTable(data, None if extrema is None else extrema[0])
+
+    def extrema(self, n):
+        """
+        Tuple (values, indices) of the extrema of channel n, or None
+
+        The start and end of its cycle table index values, so
+        indices[table['start']] are the samples the cycles start at.
+        """
+        if 'ch{}/extrema/values'.format(n) not in self:
+            return None
+        return (self.array('ch{}/extrema/values'.format(n)),
+                self.array('ch{}/extrema/indices'.format(n)))
+
+    def residue(self, n):
+        """
+        Tuple (values, indices) of the residue of channel n, or None
+        """
+        if 'ch{}/residue/values'.format(n) not in self:
+            return None
+        return (self.array('ch{}/residue/values'.format(n)),
+                self.array('ch{}/residue/indices'.format(n)))
+
+
+def aggregate(paths) -> list:
+    """
+    Sum the histograms of many result files channel by channel
+
+    INPUT
+    paths: Result files, channels with the same number are added
+
+    OUTPUT
+    List with the summed Histogram of every channel
+    """
+    channels = []
+    for path in paths:
+        results = ResultFile(path)
+        for n in range(len(results.widths)):
+            if n == len(channels):
+                channels.append([])
+            channels[n].append(results.histogram(n))
+    return [Histogram.merge(histograms) for histograms in channels]
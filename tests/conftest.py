@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+# The modules live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rainflow as rf  # noqa: E402
+
+
+@pytest.fixture(scope='session', autouse=True)
+def shared_pool():
+    yield
+    rf.close_pool()
@@ -0,0 +1,271 @@
+"""
+Regression tests for extrema extraction and every counting path
+
+Golden results pin sig2ext and the ASTM E1049 example, randomized checks
+run every engine, backend, streaming and parallel mode against the Peak
+and Valley reference implementation.
+"""
+
+import numpy as np
+import pytest
+
+import rainflow as rf
+
+BACKENDS = ['python']
+try:
+    import rainflow_jit  # noqa: F401
+    BACKENDS.append('numba')
+except ImportError:
+    pass
+
+# ASTM E1049-85 figure 6 load history and its rainflow count, in cycles
+# per range
+ASTM_HISTORY = [-2, 1, -3, 5, -1, 3, -4, 4, -2]
+ASTM_COUNTS = {3: 0.5, 4: 1.5, 6: 0.5, 8: 1.0, 9: 0.5}
+
+
+def random_signals(count=60, seed=0):
+    """
+    Rounded random walks, some with plateaus, of up to a few hundred samples
+    """
+    rng = np.random.default_rng(seed)
+    for _ in range(count):
+        n = int(rng.integers(2, 300))
+        sig = np.round(rng.standard_normal(n).cumsum() *
+                       rng.choice([0.3, 1, 4]), 1)
+        if rng.random() < 0.3:
+            sig = np.repeat(sig, rng.integers(1, 4, n))
+        yield sig
+
+
+def half_cycles(cycles):
+    """
+    Sorted (from, to) of every half cycle, full cycles give one each way
+    """
+    data = cycles.to_numpy()
+    halves = list(zip(data['from'].tolist(), data['to'].tolist()))
+    full = data['count'] == 1.0
+    halves += zip(data['to'][full].tolist(), data['from'][full].tolist())
+    return sorted(halves)
+
+
+def range_counts(cycles):
+    counts = {}
+    for cycle in cycles:
+        key = round(float(cycle['range']), 6)
+        counts[key] = counts.get(key, 0) + float(cycle['count'])
+    return counts
+
+
+def histogram(sig, **kwargs):
+    return rf.rainflow(sig, histogram=rf.Histogram(0.1), **kwargs)[1]
+
+
+class TestGolden:
+
+    def test_sig2ext_keeps_first_point_of_plateaus(self):
+        ext, index = rf.sig2ext([0, 1, 1, 2, 1, 1, 0, 0, 3, 2],
+                                return_index=True)
+        assert ext.tolist() == [0, 2, 0, 3, 2]
+        assert index.tolist() == [0, 3, 6, 8, 9]
+
+    @pytest.mark.parametrize('backend', BACKENDS)
+    def test_sig2ext_golden(self, backend):
+        sig = [1, 1, 3, 2, 2, 2, 5, 5, 4, 6, 6, 0, 1]
+        ext, index = rf.sig2ext(sig, return_index=True, backend=backend)
+        assert ext.tolist() == [1, 3, 2, 5, 4, 6, 0, 1]
+        assert index.tolist() == [0, 2, 3, 6, 8, 9, 11, 12]
+
+    @pytest.mark.parametrize('backend', BACKENDS)
+    def test_sig2ext_skips_nan(self, backend):
+        ext, index = rf.sig2ext([1, 3, np.nan, 2, 5, 0, 4], return_index=True,
+                                backend=backend)
+        assert ext.tolist() == [1, 3, 2, 5, 0, 4]
+        assert index.tolist() == [0, 1, 3, 4, 5, 6]
+
+    def test_sig2ext_short_signals(self):
+        assert rf.sig2ext([]).tolist() == []
+        assert rf.sig2ext([2]).tolist() == [2]
+        assert rf.sig2ext([2, 2, 2]).tolist() == [2]
+        assert rf.sig2ext([1, 2]).tolist() == [1, 2]
+
+    @pytest.mark.parametrize('engine', rf.ENGINES)
+    def test_astm_example(self, engine):
+        ext, cycles = rf.rainflow(ASTM_HISTORY, engine=engine)
+        assert list(ext) == ASTM_HISTORY
+        assert range_counts(cycles) == ASTM_COUNTS
+
+    def test_astm_example_cycles(self):
+        _, cycles = rf.rainflow(ASTM_HISTORY)
+        data = cycles.to_numpy()
+        full = data[data['count'] == 1.0]
+        assert full[['from', 'to', 'start', 'end']].tolist() == \
+            [(-1.0, 3.0, 4, 5)]
+        assert data['start'].tolist() == sorted(data['start'].tolist())
+
+    def test_rounding_matches_python_round(self):
+        sig = [0.05, 0.15, 0.25, -0.35, 1.45, 2.675]
+        ext, _ = rf.rainflow(sig)
+        expected = rf.sig2ext([round(float(x), 1) for x in sig])
+        assert ext.tolist() == expected.tolist()
+
+    def test_values_that_are_not_numbers_are_skipped(self):
+        ext, _ = rf.rainflow([1, '', 2, 'x', 0.5])
+        assert ext.tolist() == [1.0, 2.0, 0.5]
+
+    def test_histogram_keeps_large_bins(self):
+        counted = rf.Histogram(0.1).add([0.0, -3e8], [3e8, 0.0], 0.5)
+        assert sorted(zip(counted.froms.tolist(), counted.tos.tolist())) == \
+            [(-3000000000, 0), (0, 3000000000)]
+        # Bins too far apart to pack into one integer
+        counted.add([1e17, 1e17], [-1e17, -1e17], 0.5)
+        assert counted.froms.tolist()[-1] == 10 ** 18
+        assert counted.counts.tolist() == [0.5, 0.5, 1.0]
+
+    @pytest.mark.parametrize('engine', rf.ENGINES)
+    def test_empty_and_single_sample(self, engine):
+        for sig in ([], [3.0]):
+            _, cycles = rf.rainflow(sig, engine=engine)
+            assert len(cycles) == 0
+
+
+class TestProperties:
+
+    @pytest.mark.parametrize('engine', rf.ENGINES)
+    def test_total_half_cycles(self, engine):
+        # Every range between consecutive extrema is one half cycle
+        for sig in random_signals(30):
+            ext, cycles = rf.rainflow(sig, engine=engine)
+            assert 2 * cycles.count.sum() == len(ext) - 1
+
+    def test_largest_range_spans_the_signal(self):
+        for sig in random_signals(30, seed=1):
+            ext, cycles = rf.rainflow(sig)
+            if len(ext) > 1:
+                assert cycles.range.max() == pytest.approx(np.ptp(ext))
+
+    def test_histogram_conserves_ranges(self):
+        for sig in random_signals(30, seed=2):
+            _, cycles = rf.rainflow(sig)
+            counted = rf.Histogram(0.1).add_cycles(cycles)
+            assert counted.total == pytest.approx(cycles.count.sum())
+            binned = (counted.range_counts * counted.ranges).sum()
+            assert binned == pytest.approx(
+                (cycles.count * cycles.range).sum())
+
+    def test_stack_engine_matches_reference(self):
+        for sig in random_signals(seed=3):
+            _, reference = rf.rainflow(sig, engine='reference')
+            _, stack = rf.rainflow(sig, backend='python')
+            assert half_cycles(stack) == half_cycles(reference)
+
+    @pytest.mark.parametrize('backend', BACKENDS)
+    def test_backends_match_reference(self, backend):
+        for number, sig in enumerate(random_signals(seed=4)):
+            if number % 2:
+                # NaN samples are skipped by every backend
+                sig = np.insert(sig, [0, len(sig) // 2], np.nan)
+            _, reference = rf.rainflow(sig, engine='reference')
+            ext, cycles = rf.rainflow(sig, backend=backend)
+            assert half_cycles(cycles) == half_cycles(reference)
+            assert ext.tolist() == rf.sig2ext(
+                np.round(sig[~np.isnan(sig)], 1), backend='python').tolist()
+
+    def test_reference_engine_in_processes(self):
+        for sig in random_signals(5, seed=5):
+            _, serial = rf.rainflow(sig, engine='reference')
+            _, parallel = rf.rainflow(sig, engine='reference', workers=2)
+            assert half_cycles(parallel) == half_cycles(serial)
+
+    @pytest.mark.parametrize('backend', BACKENDS)
+    def test_parallel_count_matches_serial(self, monkeypatch, backend):
+        monkeypatch.setattr(rf, 'MIN_CHUNK', 10)
+        for sig in random_signals(10, seed=6):
+            _, serial = rf.rainflow(sig, backend=backend)
+            _, parallel = rf.rainflow(sig, workers=3, backend=backend)
+            assert half_cycles(parallel) == half_cycles(serial)
+            assert histogram(sig, workers=3, backend=backend) == \
+                histogram(sig, backend=backend)
+
+    @pytest.mark.parametrize('backend', BACKENDS)
+    def test_parallel_sig2ext_matches_serial(self, monkeypatch, backend):
+        monkeypatch.setattr(rf, 'MIN_BLOCK', 1)
+        for sig in random_signals(10, seed=7):
+            serial = rf.sig2ext(sig, return_index=True, backend=backend)
+            parallel = rf.sig2ext(sig, return_index=True, backend=backend,
+                                  workers=4)
+            assert parallel[1].tolist() == serial[1].tolist()
+
+    def test_parallel_sig2ext_of_mapped_file(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(rf, 'MIN_BLOCK', 1)
+        for n, sig in enumerate(random_signals(5, seed=14)):
+            path = str(tmp_path / '{}.npy'.format(n))
+            np.save(path, sig)
+            mapped = np.load(path, mmap_mode='r')
+            assert rf._mapped_file(mapped) is not None
+            parallel = rf.sig2ext(mapped, return_index=True, workers=3)
+            assert parallel[1].tolist() == \
+                rf.sig2ext(sig, return_index=True)[1].tolist()
+
+    @pytest.mark.parametrize('backend', BACKENDS)
+    def test_streaming_matches_batch(self, monkeypatch, backend):
+        # Flush the closed cycles into the histogram every few pushes
+        monkeypatch.setattr(rf, 'FLUSH_SIZE', 16)
+        rng = np.random.default_rng(8)
+        for sig in random_signals(30, seed=8):
+            counter = rf.RainflowCounter(backend=backend)
+            for chunk in np.array_split(sig, int(rng.integers(1, 20))):
+                counter.push_array(chunk)
+            assert counter.finalize() == histogram(sig)
+            assert rf.count_stream(sig, int(rng.integers(1, 50)),
+                                   backend=backend) == histogram(sig)
+
+    def test_streamed_extrema_match_sig2ext(self):
+        for number, sig in enumerate(random_signals(30, seed=9)):
+            if number % 2:
+                # NaN samples are skipped but still numbered
+                sig = np.insert(sig, [0, len(sig) // 3, len(sig)], np.nan)
+            chunks = list(rf.iter_extrema(iter(sig.tolist()), 7))
+            values = np.concatenate([values for values, _ in chunks])
+            indices = np.concatenate([indices for _, indices in chunks])
+            ext, index = rf.sig2ext(sig, return_index=True)
+            assert values.tolist() == ext.tolist()
+            assert indices.tolist() == index.tolist()
+
+    def test_merged_windows_are_order_invariant(self):
+        for sig in random_signals(30, seed=10):
+            windows = rf.count_windows(sig, size=17)
+            expected = histogram(sig)
+            assert rf.merge_windows(windows).snapshot() == expected
+            half = len(windows) // 2
+            if half:
+                tree = rf.merge_windows(windows[:half]) + \
+                    rf.merge_windows(windows[half:])
+                assert tree.snapshot() == expected
+
+    def test_histograms_merge_in_any_order(self):
+        parts = [rf.Histogram(0.1).add_cycles(rf.rainflow(sig)[1])
+                 for sig in random_signals(10, seed=11)]
+        forward = rf.Histogram.merge(parts)
+        backward = rf.Histogram(0.1)
+        for part in reversed(parts):
+            backward += part
+        assert forward == backward
+
+    def test_batch_matches_per_channel(self):
+        rng = np.random.default_rng(12)
+        array = np.round(rng.standard_normal((500, 4)).cumsum(axis=0), 1)
+        tables = rf.rainflow_batch(array, axis=0)
+        for column, table in zip(array.T, tables):
+            assert half_cycles(table) == half_cycles(rf.rainflow(column)[1])
+
+    def test_gate_keeps_large_full_cycles(self):
+        # A hysteresis gate removes exactly the full cycles below it
+        for sig in random_signals(30, seed=13):
+            ungated = rf.count_cycles(rf.sig2ext(sig)).to_numpy()
+            gated = rf.count_cycles(rf.sig2ext(sig, gate=1.0)).to_numpy()
+            expected = ungated[(ungated['count'] == 1.0) &
+                               (ungated['range'] >= 1.0 - 1e-9)]
+            full = gated[gated['count'] == 1.0]
+            assert sorted(map(sorted, zip(full['from'], full['to']))) == \
+                sorted(map(sorted, zip(expected['from'], expected['to'])))
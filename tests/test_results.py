@@ -0,0 +1,179 @@
+"""
+Tests for the modules built on the counting results: loaders, result
+files, the batch CLI, the result cache and fatigue damage
+"""
+
+import numpy as np
+import pytest
+
+import rainflow as rf
+import rainflow_cache as rc
+import rainflow_cli
+import rainflow_damage as rd
+import rainflow_loaders as rl
+import rainflow_store as rs
+
+
+@pytest.fixture
+def signals():
+    rng = np.random.default_rng(0)
+    return np.round(rng.standard_normal((2000, 3)).cumsum(axis=0), 1)
+
+
+def counted(sig):
+    return rf.rainflow(sig, histogram=rf.Histogram(0.1))[1]
+
+
+class TestLoaders:
+
+    def test_csv_and_npy_give_the_same_channels(self, tmp_path, signals):
+        np.save(str(tmp_path / 'data.npy'), signals)
+        np.savetxt(str(tmp_path / 'data.csv'), signals, delimiter=',',
+                   header='a,b,c', comments='')
+        for name in ('data.npy', 'data.csv'):
+            channels = rl.read_channels(str(tmp_path / name))
+            assert len(channels) == 3
+            for channel, column in zip(channels, signals.T):
+                assert np.allclose(channel, column)
+
+    def test_count_channels_matches_rainflow(self, tmp_path, signals):
+        file = str(tmp_path / 'data.npy')
+        np.save(file, signals)
+        histograms = rl.count_channels(file, chunk_rows=123)
+        for histogram, column in zip(histograms, signals.T):
+            assert histogram == counted(column)
+
+
+class TestStore:
+
+    def test_round_trip(self, tmp_path, signals):
+        tables = [rf.rainflow(column)[1] for column in signals.T]
+        histograms = [rf.Histogram(0.1).add_cycles(t) for t in tables]
+        counter = rf.RainflowCounter()
+        counter.push_array(signals[:, 0])
+        path = str(tmp_path / 'data.rfr')
+        rs.write_results(path, histograms, tables, [counter.residue],
+                         meta={'source': 'data.npy'})
+
+        results = rs.ResultFile(path)
+        assert results.meta == {'source': 'data.npy'}
+        assert results.channels == 3
+        for n, (histogram, table) in enumerate(zip(histograms, tables)):
+            assert results.histogram(n) == histogram
+            assert np.array_equal(results.cycles(n).to_numpy(),
+                                  table.to_numpy())
+            assert np.array_equal(results.column(n, 'range'), table.range)
+        values, indices = results.residue(0)
+        assert np.array_equal(values, counter.residue[0])
+        assert np.array_equal(indices, counter.residue[1])
+        assert results.residue(1) is None
+
+    def test_aggregate(self, tmp_path, signals):
+        paths = []
+        for n, column in enumerate(signals.T):
+            paths.append(str(tmp_path / '{}.rfr'.format(n)))
+            rs.write_results(paths[-1], [counted(column)])
+        total, = rs.aggregate(paths)
+        assert total == rf.Histogram.merge(
+            [counted(column) for column in signals.T])
+
+    def test_rejects_other_files(self, tmp_path):
+        path = tmp_path / 'data.rfr'
+        path.write_bytes(b'not a result file at all')
+        with pytest.raises(ValueError):
+            rs.ResultFile(str(path))
+
+
+class TestCli:
+
+    def test_recounts_when_options_change(self, tmp_path, signals, capsys):
+        np.save(str(tmp_path / 'data.npy'), signals)
+        out = str(tmp_path / 'results')
+        pattern = str(tmp_path / '*')
+        # The output directory matches the pattern too and is left out
+        for argv, counting in (([], 1), ([], 0), (['--width', '0.5'], 1),
+                               (['--width', '0.5', '--stream'], 1)):
+            args = [pattern, '-o', out, '-j', '1'] + argv
+            assert rainflow_cli.main(args) == 0
+            assert 'Counting {} of 1 files'.format(counting) in \
+                capsys.readouterr().out
+        results = rs.ResultFile(out + '/data.npy.rfr')
+        assert results.meta['width'] == 0.5
+        assert results.cycles(0) is None
+
+        # Without --stream the table can be mapped back to the samples
+        rainflow_cli.main([pattern, '-o', out, '-j', '1', '-f'])
+        results = rs.ResultFile(out + '/data.npy.rfr')
+        values, indices = results.extrema(0)
+        table = results.cycles(0)
+        assert np.array_equal(values, table.signal)
+        assert np.array_equal(signals[indices[table['start']], 0],
+                              table['from'])
+
+
+class TestCache:
+
+    def test_memory_and_disk_hits(self, tmp_path, signals):
+        cache = rc.ResultCache(str(tmp_path))
+        sig = signals[:, 0]
+        ext, cycles = rc.cached_rainflow(sig, cache)
+        assert rc.cached_rainflow(sig, cache)[1] is cycles
+
+        reopened = rc.ResultCache(str(tmp_path))
+        cached_ext, cached = rc.cached_rainflow(sig, reopened)
+        assert np.array_equal(cached_ext, ext)
+        assert np.array_equal(cached.to_numpy(), cycles.to_numpy())
+
+    def test_key_depends_on_result_parameters_only(self, signals):
+        sig = signals[:, 0]
+        assert rc.signal_key(sig) == rc.signal_key(sig.copy(), workers=4)
+        assert rc.signal_key(sig) == rc.signal_key(sig, backend='python')
+        assert rc.signal_key(sig) == rc.signal_key(sig, resolution=0.1)
+        assert rc.signal_key(sig) != rc.signal_key(sig, resolution=0.01)
+        assert rc.signal_key(sig) != rc.signal_key(sig, engine='reference')
+        assert rc.signal_key(sig) != rc.signal_key(sig + 0.1)
+
+    def test_eviction(self, tmp_path, signals):
+        cache = rc.ResultCache(str(tmp_path), max_bytes=1, max_disk_bytes=1)
+        for column in signals.T:
+            rc.cached_rainflow(column, cache)
+        assert len(cache) == 1
+        assert len(list(tmp_path.glob('*.npz'))) == 1
+
+
+class TestDamage:
+
+    def test_miner_sum_matches_cycles(self, signals):
+        curve = rd.SNCurve(m=3, C=2e12)
+        _, cycles = rf.rainflow(signals[:, 0])
+        expected = (cycles.count * cycles.range ** 3 / 2e12).sum()
+        damage = rd.damage(rf.Histogram(0.1).add_cycles(cycles), curve)
+        assert damage == pytest.approx(expected)
+
+    def test_basquin_curve(self):
+        curve = rd.SNCurve.basquin(sigma_f=900, b=-0.1)
+        amplitude = 900 * (2 * 1e6) ** -0.1
+        assert curve.cycles(amplitude) == pytest.approx(1e6)
+
+    def test_goodman_raises_damage_of_tensile_means(self, signals):
+        curve = rd.SNCurve.basquin(sigma_f=900, b=-0.1)
+        histogram = counted(signals[:, 0] + 50)
+        assert rd.damage(histogram, curve, 'goodman', ultimate=600) > \
+            rd.damage(histogram, curve)
+
+    @pytest.mark.parametrize('correction', ['goodman', 'gerber'])
+    def test_mean_at_ultimate_fails(self, correction):
+        curve = rd.SNCurve.basquin(sigma_f=900, b=-0.1)
+        histogram = rf.Histogram(1.0).add([700, 500], [720, 520], 1.0)
+        damage = rd.bin_damage(histogram, curve, correction, ultimate=600)
+        assert np.isinf(damage[histogram.froms >= 700]).all()
+        assert np.isfinite(damage[histogram.froms < 600]).all()
+
+    def test_accumulator_matches_whole_signal(self, signals):
+        curve = rd.SNCurve(m=3, C=2e12)
+        accumulator = rd.DamageAccumulator(curve)
+        for chunk in np.array_split(signals[:, 1], 9):
+            accumulator.push_array(chunk)
+        expected = rd.damage(counted(signals[:, 1]), curve)
+        assert accumulator.damage == pytest.approx(expected)
+        assert accumulator.finalize() == pytest.approx(expected)